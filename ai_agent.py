@@ -1,20 +1,38 @@
+import asyncio
+import hashlib
 from typing import Literal
 
 from langgraph.graph import END, StateGraph
 
+from analysis_cache import CACHE_ENABLED, analysis_cache, make_cache_key
+from cpu_executor import run_cpu
+from database import normalized_code_hash
 from experts import (
     cpp_expert,
     csharp_expert,
+    expert_module,
     generic_expert,
     java_expert,
     js_expert,
     python_expert,
 )
-from linter_engine import run_python_linter
+from experts.base_expert import PROMPT_VERSION, analyze_batch_with_persona
+from linter_engine import lint_file
+from llm_registry import EXPERT_MODEL, LIGHT_EXPERT_MODEL
+from llm_scheduler import Priority
+from metrics import instrument_node
 from shared_state import AgentState
+from singleflight import SingleFlight
+from triage import (
+    TRIAGE_ENABLED,
+    classify,
+    compute_metrics,
+    record,
+    templated_analysis,
+)
 
 
-def guardrail_node(state: AgentState):
+async def guardrail_node(state: AgentState):
     """Simple check before routing to expensive experts."""
     code = state["code"]
     if not code or len(code.strip()) < 5:  # noqa: PLR2004
@@ -22,22 +40,46 @@ def guardrail_node(state: AgentState):
     return {"error": None}
 
 
-def linter_node(state: AgentState):
-    code = state["code"]
-    lang = state["language"].lower()
-
-    errors = []
-    if lang == "python":
-        errors = run_python_linter(code)
+async def linter_node(state: AgentState):
+    # Errors already computed from the whole file are more accurate than
+    # re-linting the isolated function, so keep them as-is
+    if state.get("linter_errors") is not None:
+        return {}
 
-    # We can add C++/Java linters here later
+    diagnostics = await run_cpu(lint_file, state["code"], state["language"])
+    errors = [d.format() for d in diagnostics]
 
     return {"linter_errors": errors}
 
 
+async def triage_node(state: AgentState):
+    """
+    Static pre-triage: trivial or generated code gets a templated answer
+    without an LLM call, simple code is routed to the light model.
+    """
+    if not TRIAGE_ENABLED:
+        return {}
+
+    metrics = await run_cpu(
+        compute_metrics,
+        state["code"],
+        state["language"],
+        generated_file=state.get("generated_file", False),
+    )
+    tier = classify(metrics, state.get("linter_errors"))
+    record(tier)
+
+    update: dict = {"triage": {**metrics, "tier": tier}}
+    if tier == "template":
+        update["analysis"] = templated_analysis(state["function_name"], metrics)
+    elif tier == "light":
+        update["expert_model"] = LIGHT_EXPERT_MODEL
+    return update
+
+
 # --- 2. ROUTER LOGIC ---
-def route_language(  # noqa: PLR0911
-    state: AgentState,
+def resolve_expert(  # noqa: PLR0911
+    language: str,
 ) -> Literal[
     "python_expert",
     "cpp_expert",
@@ -45,12 +87,8 @@ def route_language(  # noqa: PLR0911
     "java_expert",
     "csharp_expert",
     "generic_expert",
-    "end",
 ]:
-    if state.get("error"):
-        return "end"
-
-    lang = state["language"].lower()
+    lang = language.lower()
 
     # Mapping
     if lang == "python":
@@ -67,24 +105,44 @@ def route_language(  # noqa: PLR0911
     return "generic_expert"
 
 
+def route_language(
+    state: AgentState,
+) -> Literal[
+    "python_expert",
+    "cpp_expert",
+    "js_expert",
+    "java_expert",
+    "csharp_expert",
+    "generic_expert",
+    "end",
+]:
+    # Errors and templated (triaged) answers skip the experts
+    if state.get("error") or state.get("analysis"):
+        return "end"
+
+    return resolve_expert(state["language"])
+
+
 workflow = StateGraph(AgentState)
 
 
-workflow.add_node("guardrail", guardrail_node)
-workflow.add_node("linter", linter_node)
-workflow.add_node("python_expert", python_expert)
-workflow.add_node("cpp_expert", cpp_expert)
-workflow.add_node("js_expert", js_expert)
-workflow.add_node("java_expert", java_expert)
-workflow.add_node("csharp_expert", csharp_expert)
-workflow.add_node("generic_expert", generic_expert)
+workflow.add_node("guardrail", instrument_node("guardrail", guardrail_node))
+workflow.add_node("linter", instrument_node("linter", linter_node))
+workflow.add_node("triage", instrument_node("triage", triage_node))
+workflow.add_node("python_expert", instrument_node("python_expert", python_expert))
+workflow.add_node("cpp_expert", instrument_node("cpp_expert", cpp_expert))
+workflow.add_node("js_expert", instrument_node("js_expert", js_expert))
+workflow.add_node("java_expert", instrument_node("java_expert", java_expert))
+workflow.add_node("csharp_expert", instrument_node("csharp_expert", csharp_expert))
+workflow.add_node("generic_expert", instrument_node("generic_expert", generic_expert))
 
 workflow.set_entry_point("guardrail")
 workflow.add_edge("guardrail", "linter")
+workflow.add_edge("linter", "triage")
 
 
 workflow.add_conditional_edges(
-    "linter",
+    "triage",
     route_language,
     {
         "python_expert": "python_expert",
@@ -109,20 +167,262 @@ for node in [
 
 graph = workflow.compile()
 
+# In-flight analyses shared between concurrent identical requests
+agent_flights = SingleFlight()
+
 
-def run_agent(code: str, language: str, function_name: str) -> dict:
-    initial_state = {
+def _initial_state(
+    code: str,
+    language: str,
+    function_name: str,
+    linter_errors: list[str] | None,
+    priority: Priority,
+    generated_file: bool,  # noqa: FBT001
+) -> dict:
+    return {
         "code": code,
         "language": language,
         "function_name": function_name,
         "analysis": None,
         "error": None,
-        "linter_errors": None,
+        "linter_errors": linter_errors,
+        "priority": int(priority),
+        "generated_file": generated_file,
+        "triage": None,
+        "expert_model": None,
     }
 
-    result = graph.invoke(initial_state)  # type: ignore #noqa:PGH003
+
+def _flight_key(
+    code: str,
+    language: str,
+    function_name: str,
+    use_cache: bool,  # noqa: FBT001
+    linter_errors: list[str] | None,
+    generated_file: bool,  # noqa: FBT001
+) -> tuple:
+    """
+    What makes two analysis runs interchangeable: a cache-bypassing call
+    must not join a cache-reading one, and the same function in different
+    files may carry different errors (or a generator banner) along.
+    """
+    errors_hash = (
+        None
+        if linter_errors is None
+        else hashlib.sha256("\n".join(linter_errors).encode("utf-8")).hexdigest()
+    )
+    return (
+        normalized_code_hash(code),
+        language.lower(),
+        function_name,
+        use_cache,
+        errors_hash,
+        generated_file,
+    )
+
+
+def _lookup_cache(
+    code: str,
+    language: str,
+    use_cache: bool,  # noqa: FBT001
+) -> tuple[str | None, dict | None]:
+    """Returns (cache key to store under, cached analysis if any)."""
+    if not CACHE_ENABLED:
+        return None, None
+
+    cache_key = make_cache_key(code, language, resolve_expert(language), PROMPT_VERSION)
+    if not use_cache:
+        analysis_cache.record_bypass()
+        return cache_key, None
+
+    return cache_key, analysis_cache.get(cache_key)
+
+
+def run_agent(
+    code: str,
+    language: str,
+    function_name: str,
+    use_cache: bool = True,  # noqa: FBT001, FBT002
+    linter_errors: list[str] | None = None,
+    priority: Priority = Priority.STANDARD,
+    generated_file: bool = False,  # noqa: FBT001, FBT002
+) -> dict:
+    """Blocking run_agent_async for scripts; must not be called from a running event loop."""
+    return asyncio.run(
+        run_agent_async(
+            code,
+            language,
+            function_name,
+            use_cache,
+            linter_errors,
+            priority,
+            generated_file,
+        ),
+    )
+
+
+async def run_agent_async(
+    code: str,
+    language: str,
+    function_name: str,
+    use_cache: bool = True,  # noqa: FBT001, FBT002
+    linter_errors: list[str] | None = None,
+    priority: Priority = Priority.STANDARD,
+    generated_file: bool = False,  # noqa: FBT001, FBT002
+) -> dict:
+    """
+    Same as run_agent, but awaitable so many functions can be analyzed at once.
+
+    ``generated_file`` marks a function from a file with a generator banner
+    (see extract_with_fallback). Concurrent calls for the same function
+    (see _flight_key) share a single in-flight run instead of each hitting
+    the LLM.
+    """
+    return await agent_flights.do(
+        _flight_key(code, language, function_name, use_cache, linter_errors, generated_file),
+        lambda: _run_agent_async(
+            code,
+            language,
+            function_name,
+            use_cache,
+            linter_errors,
+            priority,
+            generated_file,
+        ),
+    )
+
+
+async def _run_agent_async(
+    code: str,
+    language: str,
+    function_name: str,
+    use_cache: bool,  # noqa: FBT001
+    linter_errors: list[str] | None,
+    priority: Priority,
+    generated_file: bool,  # noqa: FBT001
+) -> dict:
+    # SQLite reads and writes go through to_thread: they can wait on a lock
+    cache_key, cached = await asyncio.to_thread(_lookup_cache, code, language, use_cache)
+    if cached is not None:
+        return cached
+
+    initial_state = _initial_state(
+        code,
+        language,
+        function_name,
+        linter_errors,
+        priority,
+        generated_file,
+    )
+
+    result = await graph.ainvoke(initial_state)  # type: ignore #noqa:PGH003
 
     if result.get("error"):
         raise ValueError(result["error"])
 
+    # The cache is keyed by code alone; a generated-file template must not
+    # answer for the same function in a hand-written file
+    if cache_key and not generated_file:
+        await asyncio.to_thread(analysis_cache.put, cache_key, result["analysis"])
+
     return result["analysis"]
+
+
+async def run_agent_batch_async(
+    functions: list[dict],
+    language: str,
+    use_cache: bool = True,  # noqa: FBT001, FBT002
+    priority: Priority = Priority.STANDARD,
+) -> dict[int, dict]:
+    """
+    Analyzes several small functions with one structured LLM call.
+
+    Returns position -> analysis. Cached functions are answered from the
+    cache; positions missing from the result (guardrail rejects, or the
+    model skipped them) should be retried with run_agent_async.
+
+    Concurrent calls for the same functions (see _flight_key) share a
+    single in-flight batch.
+    """
+    key = tuple(
+        _flight_key(
+            func["code"],
+            language,
+            func["name"],
+            use_cache,
+            func.get("linter_errors"),
+            func.get("generated_file", False),
+        )
+        for func in functions
+    )
+    return await agent_flights.do(
+        key,
+        lambda: _run_agent_batch_async(functions, language, use_cache, priority),
+    )
+
+
+async def _run_agent_batch_async(
+    functions: list[dict],
+    language: str,
+    use_cache: bool,  # noqa: FBT001
+    priority: Priority,
+) -> dict[int, dict]:
+    results: dict[int, dict] = {}
+    pending: dict[str, tuple[int, str | None]] = {}
+    light_only = True
+    prompt_items: dict[str, tuple[str, list[str] | None]] = {}
+
+    for position, func in enumerate(functions):
+        cache_key, cached = await asyncio.to_thread(
+            _lookup_cache,
+            func["code"],
+            language,
+            use_cache,
+        )
+        if cached is not None:
+            results[position] = cached
+            continue
+
+        state = _initial_state(
+            func["code"],
+            language,
+            func["name"],
+            func.get("linter_errors"),
+            priority,
+            func.get("generated_file", False),
+        )
+        if (await guardrail_node(state))["error"]:
+            continue
+        state.update(await linter_node(state))
+        state.update(await triage_node(state))
+        if state["analysis"]:
+            results[position] = state["analysis"]
+            continue
+
+        # Overloads share a name, so labels get a suffix to stay unique
+        label = func["name"]
+        if label in prompt_items:
+            label = f"{func['name']} #{position + 1}"
+        light_only = light_only and state["expert_model"] == LIGHT_EXPERT_MODEL
+        pending[label] = (position, cache_key)
+        prompt_items[label] = (func["code"], state["linter_errors"])
+
+    if not prompt_items:
+        return results
+
+    expert = expert_module(resolve_expert(language))
+    analyses = await analyze_batch_with_persona(
+        prompt_items,
+        expert.LANG_LABEL,
+        expert.INSTRUCTIONS,
+        priority,
+        LIGHT_EXPERT_MODEL if light_only else EXPERT_MODEL,
+    )
+
+    for label, analysis in analyses.items():
+        position, cache_key = pending[label]
+        results[position] = analysis
+        if cache_key:
+            await asyncio.to_thread(analysis_cache.put, cache_key, analysis)
+
+    return results
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from sqlite3 import DatabaseError, connect
+
+from database import normalized_code_hash
+from metrics import ANALYSIS_CACHE_REQUESTS, DB_WRITE_SECONDS
+
+CACHE_DB_NAME = os.getenv("ANALYSIS_CACHE_DB", "analysis_cache.db")
+CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def make_cache_key(code: str, language: str, expert: str, prompt_version: str) -> str:
+    """Content-addressed key: same code (modulo whitespace) + same prompt = same answer."""
+    raw_key = ":".join(
+        [normalized_code_hash(code), language.lower(), expert, prompt_version],
+    )
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Persistent LRU/TTL cache of expert analyses.
+
+    Entries are evicted when older than ``ttl_seconds`` or, once the table
+    grows past ``max_entries``, least-recently-used first.
+    """
+
+    def __init__(
+        self,
+        db_path: str = CACHE_DB_NAME,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl_seconds: int = CACHE_TTL_SECONDS,
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = 0
+
+    def _connection(self):
+        # Opened lazily so importing this module never touches the disk
+        if self._conn is None:
+            conn = connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    analysis TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_accessed
+                ON analysis_cache (last_accessed)
+            """)
+            conn.commit()
+            self._size = conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT analysis, created_at FROM analysis_cache WHERE cache_key = ?",
+                    (key,),
+                ).fetchone()
+
+                if row is None:
+                    self.misses += 1
+                    ANALYSIS_CACHE_REQUESTS.inc(result="miss")
+                    return None
+
+                analysis, created_at = row
+                if now - created_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM analysis_cache WHERE cache_key = ?", (key,))
+                    conn.commit()
+                    self._size -= 1
+                    self.evictions += 1
+                    self.misses += 1
+                    ANALYSIS_CACHE_REQUESTS.inc(result="miss")
+                    return None
+
+                conn.execute(
+                    "UPDATE analysis_cache SET last_accessed = ? WHERE cache_key = ?",
+                    (now, key),
+                )
+                conn.commit()
+                self.hits += 1
+                ANALYSIS_CACHE_REQUESTS.inc(result="hit")
+                return json.loads(analysis)
+        except DatabaseError as e:
+            # A broken cache must never break analysis; fall through to the LLM
+            print(f"⚠️ Analysis cache read failed: {e}")
+            return None
+
+    def put(self, key: str, analysis: dict):
+        now = time.time()
+        try:
+            with self._lock, DB_WRITE_SECONDS.time(operation="analysis_cache_put"):
+                conn = self._connection()
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO analysis_cache "
+                    "(cache_key, analysis, created_at, last_accessed) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(analysis), now, now),
+                )
+                if cursor.rowcount == 0:
+                    conn.execute(
+                        "UPDATE analysis_cache "
+                        "SET analysis = ?, created_at = ?, last_accessed = ? "
+                        "WHERE cache_key = ?",
+                        (json.dumps(analysis), now, now, key),
+                    )
+                else:
+                    self._size += 1
+
+                if self._size > self.max_entries:
+                    self._evict(conn, now)
+                conn.commit()
+        except DatabaseError as e:
+            print(f"⚠️ Analysis cache write failed: {e}")
+
+    def _evict(self, conn, now: float):
+        """Drops expired rows, then the least-recently-used ones above the cap."""
+        expired = conn.execute(
+            "DELETE FROM analysis_cache WHERE created_at < ?",
+            (now - self.ttl_seconds,),
+        ).rowcount
+        self._size -= expired
+        self.evictions += expired
+
+        overflow = self._size - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                """
+                DELETE FROM analysis_cache WHERE cache_key IN (
+                    SELECT cache_key FROM analysis_cache
+                    ORDER BY last_accessed ASC LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+            self._size -= overflow
+            self.evictions += overflow
+
+    def record_bypass(self):
+        self.bypassed += 1
+        ANALYSIS_CACHE_REQUESTS.inc(result="bypass")
+
+    def stats(self) -> dict:
+        try:
+            with self._lock:
+                self._connection()
+        except DatabaseError as e:
+            print(f"⚠️ Analysis cache unavailable: {e}")
+        lookups = self.hits + self.misses
+        return {
+            "enabled": CACHE_ENABLED,
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+analysis_cache = AnalysisCache()
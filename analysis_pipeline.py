@@ -0,0 +1,316 @@
+import asyncio
+import os
+from collections.abc import AsyncIterator
+
+from ai_agent import run_agent_async, run_agent_batch_async
+from answer_store import lookup_best_explanations
+from database import normalized_code_hash
+from linter_engine import assign_linter_errors, lint_file
+from llm_scheduler import estimate_tokens
+from parser_engine import TreeSitterParser
+from triage import has_generated_banner
+
+# Upper bound on expert calls in flight across ALL requests on this worker.
+GLOBAL_MAX_CONCURRENCY = int(os.getenv("ANALYZE_GLOBAL_CONCURRENCY", "16"))
+
+# Default (and maximum) number of functions analyzed in parallel per request.
+REQUEST_MAX_CONCURRENCY = int(os.getenv("ANALYZE_REQUEST_CONCURRENCY", "4"))
+
+# Micro-batching: functions up to BATCH_FUNCTION_TOKENS are grouped (up to
+# BATCH_TOKEN_BUDGET / BATCH_MAX_FUNCTIONS) into one structured LLM call.
+BATCH_ENABLED = os.getenv("ANALYZE_BATCH_ENABLED", "true").lower() == "true"
+BATCH_FUNCTION_TOKENS = int(os.getenv("ANALYZE_BATCH_FUNCTION_TOKENS", "150"))
+BATCH_TOKEN_BUDGET = int(os.getenv("ANALYZE_BATCH_TOKEN_BUDGET", "1500"))
+BATCH_MAX_FUNCTIONS = int(os.getenv("ANALYZE_BATCH_MAX_FUNCTIONS", "8"))
+
+_global_semaphore = asyncio.Semaphore(GLOBAL_MAX_CONCURRENCY)
+
+
+def extract_with_fallback(
+    parser: TreeSitterParser,
+    raw_code: str,
+    language: str,
+    tree=None,
+) -> list[dict]:
+    """
+    Parses code into function blocks with their linter errors and the
+    file's generator-banner flag ("generated_file") attached.
+
+    Falls back to one "Main Script" block when no functions are found.
+    Parser errors (e.g. the language-mismatch ValueError) propagate.
+    """
+    if tree is None:
+        tree = parser.parse(raw_code, lang_name=language)
+    functions = parser.extract_functions(raw_code, lang_name=language, tree=tree)
+
+    if not functions:
+        functions = [
+            {
+                "name": "Main Script",
+                "code": raw_code,
+                "start_line": 1,
+                "end_line": len(raw_code.splitlines()),
+            },
+        ]
+
+    # Generator banners sit above the first function, so check the file once
+    generated_file = has_generated_banner(raw_code)
+    for func in functions:
+        func["generated_file"] = generated_file
+
+    # Lint the whole file once and hand each function its own slice
+    assign_linter_errors(functions, lint_file(raw_code, language, tree=tree))
+
+    return functions
+
+
+def build_report(func: dict, analysis: dict) -> dict:
+    """Wraps an expert analysis with the function metadata the client expects."""
+    return {
+        "meta": {
+            "function_name": func["name"],
+            "start_line": func["start_line"],
+            "end_line": func["end_line"],
+            "code": func["code"],
+            "context": func.get("context"),
+        },
+        "analysis": analysis,
+    }
+
+
+def build_error(func: dict, exc: Exception) -> dict:
+    return {"meta": func, "error": {"message": str(exc)}}
+
+
+def resolve_concurrency(requested: int | None) -> int:
+    """Clamps the client-requested limit to the server-side per-request cap."""
+    if requested is None:
+        return REQUEST_MAX_CONCURRENCY
+    return max(1, min(requested, REQUEST_MAX_CONCURRENCY))
+
+
+async def analyze_function(
+    func: dict,
+    language: str,
+    request_semaphore: asyncio.Semaphore,
+    use_cache: bool = True,  # noqa: FBT001, FBT002
+) -> dict:
+    """
+    Runs the expert graph for one function.
+
+    Never raises: failures are turned into error reports so that one bad
+    function does not cancel its siblings.
+    """
+    # Take the per-request slot first so a queued request does not hold
+    # global slots while it waits for its own turn.
+    async with request_semaphore, _global_semaphore:
+        print(f"🤖 Analyzing function: {func['name']} ({language})...")
+        try:
+            analysis = await run_agent_async(
+                func["code"],
+                language,
+                func["name"],
+                use_cache=use_cache,
+                linter_errors=func.get("linter_errors"),
+                generated_file=func.get("generated_file", False),
+            )
+        except Exception as e:  # noqa: BLE001
+            print(f"⚠️ AI Analysis failed for {func['name']}: {e}")
+            return build_error(func, e)
+
+    return build_report(func, analysis)
+
+
+def plan_batches(functions: list[dict]) -> tuple[list[list[int]], list[int]]:
+    """
+    Splits function indexes into micro-batches and functions to analyze alone.
+
+    Small functions are packed in source order; a "batch" of one is
+    analyzed alone since batching it would save nothing.
+    """
+    if not BATCH_ENABLED:
+        return [], list(range(len(functions)))
+
+    batches: list[list[int]] = []
+    singles: list[int] = []
+    current: list[int] = []
+    current_tokens = 0
+    for index, func in enumerate(functions):
+        tokens = estimate_tokens(func["code"])
+        if tokens > BATCH_FUNCTION_TOKENS:
+            singles.append(index)
+            continue
+        if current and (
+            current_tokens + tokens > BATCH_TOKEN_BUDGET or len(current) >= BATCH_MAX_FUNCTIONS
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+
+    singles.extend(batch[0] for batch in batches if len(batch) == 1)
+    return [batch for batch in batches if len(batch) > 1], sorted(singles)
+
+
+async def analyze_batch(
+    indexes: list[int],
+    functions: list[dict],
+    language: str,
+    request_semaphore: asyncio.Semaphore,
+    use_cache: bool = True,  # noqa: FBT001, FBT002
+) -> list[tuple[int, dict]]:
+    """
+    Analyzes a micro-batch with one LLM call, holding a single concurrency slot.
+
+    Functions the batched output did not cover (or all of them, if the call
+    or its validation failed) fall back to per-function analysis.
+    """
+    batch = [functions[index] for index in indexes]
+    async with request_semaphore, _global_semaphore:
+        print(f"🤖 Analyzing {len(batch)} small functions in one batch ({language})...")
+        try:
+            analyses = await run_agent_batch_async(batch, language, use_cache=use_cache)
+        except Exception as e:  # noqa: BLE001
+            print(f"⚠️ Batched analysis failed, falling back to single calls: {e}")
+            analyses = {}
+
+    reports = [
+        (index, build_report(functions[index], analyses[position]))
+        for position, index in enumerate(indexes)
+        if position in analyses
+    ]
+    # Slots are released above: the fallbacks take their own
+    missing = [index for position, index in enumerate(indexes) if position not in analyses]
+    fallbacks = await asyncio.gather(
+        *(
+            analyze_function(functions[index], language, request_semaphore, use_cache=use_cache)
+            for index in missing
+        ),
+    )
+    return reports + list(zip(missing, fallbacks, strict=True))
+
+
+async def lookup_stored_reports(
+    functions: list[dict],
+    use_cache: bool = True,  # noqa: FBT001, FBT002
+) -> dict[int, dict]:
+    """
+    Reports for functions whose code already has a top-voted explanation.
+
+    Skipped (like the analysis cache) when the client asks for a fresh run.
+    """
+    if not use_cache:
+        return {}
+    hashes = [normalized_code_hash(func["code"]) for func in functions]
+    try:
+        found = await asyncio.to_thread(lookup_best_explanations, hashes)
+    except Exception as e:  # noqa: BLE001
+        print(f"⚠️ Best-answer lookup failed, analyzing everything: {e}")
+        return {}
+
+    reports = {}
+    for index, code_hash in enumerate(hashes):
+        if code_hash in found:
+            stored = found[code_hash]
+            reports[index] = {
+                **build_report(functions[index], stored["analysis"]),
+                "source": "community_feedback",
+                "feedback": {
+                    "upvotes": stored["upvotes"],
+                    "downvotes": stored["downvotes"],
+                    "score": stored["score"],
+                },
+            }
+    return reports
+
+
+def _analysis_jobs(
+    functions: list[dict],
+    language: str,
+    request_semaphore: asyncio.Semaphore,
+    use_cache: bool,  # noqa: FBT001
+    skip: dict[int, dict],
+) -> list:
+    """
+    One coroutine per batch or single function, each returning (index, report) pairs.
+
+    Indexes in ``skip`` (already answered) get no job.
+    """
+
+    async def single(index: int) -> list[tuple[int, dict]]:
+        report = await analyze_function(
+            functions[index],
+            language,
+            request_semaphore,
+            use_cache=use_cache,
+        )
+        return [(index, report)]
+
+    pending = [index for index in range(len(functions)) if index not in skip]
+    batches, singles = plan_batches([functions[index] for index in pending])
+    return [
+        *(
+            analyze_batch(
+                [pending[position] for position in batch],
+                functions,
+                language,
+                request_semaphore,
+                use_cache=use_cache,
+            )
+            for batch in batches
+        ),
+        *(single(pending[position]) for position in singles),
+    ]
+
+
+async def analyze_functions(
+    functions: list[dict],
+    language: str,
+    max_concurrency: int | None = None,
+    use_cache: bool = True,  # noqa: FBT001, FBT002
+) -> list[dict]:
+    """Analyzes all functions concurrently and returns reports in source order."""
+    request_semaphore = asyncio.Semaphore(resolve_concurrency(max_concurrency))
+    stored = await lookup_stored_reports(functions, use_cache=use_cache)
+    results: list[dict] = [{}] * len(functions)
+    for index, report in stored.items():
+        results[index] = report
+    for pairs in await asyncio.gather(
+        *_analysis_jobs(functions, language, request_semaphore, use_cache, stored),
+    ):
+        for index, report in pairs:
+            results[index] = report
+    return results
+
+
+async def iter_analyses(
+    functions: list[dict],
+    language: str,
+    max_concurrency: int | None = None,
+    use_cache: bool = True,  # noqa: FBT001, FBT002
+) -> AsyncIterator[tuple[int, dict]]:
+    """
+    Yields (source index, report) pairs as soon as each function finishes.
+
+    Stored community answers come first, and functions in the same
+    micro-batch arrive together. Closing the iterator early (e.g. the
+    client disconnected) cancels the analyses that are still pending.
+    """
+    request_semaphore = asyncio.Semaphore(resolve_concurrency(max_concurrency))
+    stored = await lookup_stored_reports(functions, use_cache=use_cache)
+
+    tasks = [
+        asyncio.create_task(job)
+        for job in _analysis_jobs(functions, language, request_semaphore, use_cache, stored)
+    ]
+    try:
+        for pair in stored.items():
+            yield pair
+        for next_done in asyncio.as_completed(tasks):
+            for pair in await next_done:
+                yield pair
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,140 @@
+import math
+import os
+import threading
+from sqlite3 import Connection
+
+from pydantic import ValidationError
+
+from database import db_pool
+from schemas import CodeSenseiAnalysis
+
+BEST_ANSWERS_ENABLED = os.getenv("BEST_ANSWERS_ENABLED", "true").lower() == "true"
+# An explanation is served instead of calling the LLM once it has at least
+# this many votes and a Wilson lower bound of its upvote ratio above the score
+BEST_ANSWER_MIN_VOTES = int(os.getenv("BEST_ANSWER_MIN_VOTES", "5"))
+BEST_ANSWER_MIN_SCORE = float(os.getenv("BEST_ANSWER_MIN_SCORE", "0.7"))
+
+# 95% confidence
+WILSON_Z = 1.96
+
+# Votes on bare explanation text carry no score; report the scale's midpoint
+UNSCORED_QUALITY_SCORE = 5
+
+# Updated by the feedback writer thread and by request threads
+_metrics = {"hits": 0, "misses": 0, "refreshed": 0}
+_metrics_lock = threading.Lock()
+
+
+def wilson_lower_bound(upvotes: int, downvotes: int, z: float = WILSON_Z) -> float:
+    """
+    Lower bound of the Wilson score interval for the upvote ratio.
+
+    Unlike the raw ratio it rewards volume: 1 up / 0 down scores ~0.21,
+    50 up / 5 down ~0.80.
+    """
+    total = upvotes + downvotes
+    if total == 0:
+        return 0.0
+    ratio = upvotes / total
+    centre = ratio + z * z / (2 * total)
+    spread = z * math.sqrt((ratio * (1 - ratio) + z * z / (4 * total)) / total)
+    return (centre - spread) / (1 + z * z / total)
+
+
+def refresh_best_explanations(conn: Connection, code_hashes: set[str] | None = None):
+    """
+    Recomputes best_explanations for the given hashes (all hashes if None).
+
+    Runs on the caller's connection so the feedback writer can refresh
+    inside the same transaction as the votes it just wrote.
+    """
+    query = "SELECT code_hash, id, ai_explanation, upvotes, downvotes FROM feedback_loops"
+    params: tuple = ()
+    if code_hashes is not None:
+        if not code_hashes:
+            return
+        query += f" WHERE code_hash IN ({','.join('?' * len(code_hashes))})"
+        params = tuple(code_hashes)
+
+    best: dict[str, tuple] = {}
+    for code_hash, feedback_id, explanation, upvotes, downvotes in conn.execute(query, params):
+        if upvotes + downvotes < BEST_ANSWER_MIN_VOTES:
+            continue
+        score = wilson_lower_bound(upvotes, downvotes)
+        if score < BEST_ANSWER_MIN_SCORE:
+            continue
+        if code_hash not in best or score > best[code_hash][-1]:
+            best[code_hash] = (code_hash, feedback_id, explanation, upvotes, downvotes, score)
+
+    # Hashes whose winner fell below the threshold lose their stored answer
+    stale = (code_hashes if code_hashes is not None else set()) - best.keys()
+    conn.executemany("DELETE FROM best_explanations WHERE code_hash = ?", [(h,) for h in stale])
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO best_explanations
+        (code_hash, feedback_id, ai_explanation, upvotes, downvotes, score, last_updated)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """,
+        list(best.values()),
+    )
+    with _metrics_lock:
+        _metrics["refreshed"] += len(best) + len(stale)
+
+
+def rebuild_best_explanations():
+    """Full rebuild (startup backfill for votes written before the table existed)."""
+    with db_pool.connection() as conn, conn:
+        conn.execute("DELETE FROM best_explanations")
+        refresh_best_explanations(conn)
+
+
+def stored_analysis(explanation: str) -> dict:
+    """
+    Turns a stored explanation back into an analysis payload.
+
+    Clients may vote on the whole analysis (JSON) or on its explanation
+    text; either way the result is a valid CodeSenseiAnalysis.
+    """
+    try:
+        return CodeSenseiAnalysis.model_validate_json(explanation).model_dump()
+    except ValidationError:
+        return CodeSenseiAnalysis(
+            complexity_estimate="Not assessed",
+            plain_english_explanation=explanation,
+            issues=[],
+            quality_score=UNSCORED_QUALITY_SCORE,
+        ).model_dump()
+
+
+def lookup_best_explanations(code_hashes: list[str]) -> dict[str, dict]:
+    """code_hash -> {"analysis", "upvotes", "downvotes", "score"} for every hash with a stored answer."""
+    if not BEST_ANSWERS_ENABLED or not code_hashes:
+        return {}
+
+    unique = list(dict.fromkeys(code_hashes))
+    with db_pool.connection() as conn:
+        rows = conn.execute(
+            "SELECT code_hash, ai_explanation, upvotes, downvotes, score "  # noqa: S608
+            f"FROM best_explanations WHERE code_hash IN ({','.join('?' * len(unique))})",
+            unique,
+        ).fetchall()
+
+    found = {
+        code_hash: {
+            "analysis": stored_analysis(explanation),
+            "upvotes": upvotes,
+            "downvotes": downvotes,
+            "score": round(score, 4),
+        }
+        for code_hash, explanation, upvotes, downvotes, score in rows
+    }
+    hits = sum(1 for code_hash in code_hashes if code_hash in found)
+    with _metrics_lock:
+        _metrics["hits"] += hits
+        _metrics["misses"] += len(code_hashes) - hits
+    return found
+
+
+def answer_store_stats() -> dict:
+    with _metrics_lock:
+        return {"enabled": BEST_ANSWERS_ENABLED, **_metrics}
@@ -1,33 +1,78 @@
-import hashlib
-import re
+import asyncio
+import json
+import time
 from contextlib import asynccontextmanager
-from sqlite3 import Connection
+from functools import lru_cache
+from sqlite3 import DatabaseError
 from typing import Annotated
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
-from ai_agent import run_agent
+from ai_agent import agent_flights
+from analysis_cache import analysis_cache
+from analysis_pipeline import (
+    analyze_functions,
+    build_report,
+    extract_with_fallback,
+    iter_analyses,
+)
+from answer_store import answer_store_stats, rebuild_best_explanations
 from chat_agent import CodeSenseiChat
-from database import create_table, get_db
+from chat_sessions import ChatSession, chat_sessions
+from cpu_executor import run_cpu
+from database import create_table, db_pool, normalized_code_hash
+from editor_sessions import EditorSession, editor_sessions, function_fingerprint
+from experts import warm_up_experts
+from export_feedback import iter_feedback_rows, iter_gzip, iter_ndjson, normalize_since
+from feedback_writer import FeedbackQueueFullError, Vote, feedback_writer
+from llm_scheduler import SchedulerQueueFullError, llm_scheduler
+from metrics import HTTP_REQUEST_SECONDS, STREAM_FIRST_RESULT_SECONDS, registry
 from parser_engine import TreeSitterParser, get_parser
-from schemas import ChatRequest, CodeRequest, FeedbackRequest
+from schemas import (
+    ChatRequest,
+    ChatSessionMessage,
+    ChatSessionRequest,
+    CodeRequest,
+    FeedbackRequest,
+    SessionEditRequest,
+)
+from triage import triage_stats
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  # noqa: ARG001
     # Startup: Create DB Tables
     create_table()
+    # Build the shared LLM clients and chains once, before the first request
+    try:
+        warm_up_experts()
+        get_chat_agent()
+    except ValueError as e:
+        print(f"⚠️ LLM warm-up skipped: {e}")
+    try:
+        await asyncio.to_thread(rebuild_best_explanations)
+    except DatabaseError as e:
+        print(f"⚠️ Best-explanation rebuild failed: {e}")
+    feedback_writer.start()
     yield
-    # Shutdown: Clean up if necessary
+    # Shutdown: commit queued votes before the process exits
+    await asyncio.to_thread(feedback_writer.stop)
+    db_pool.close()
 
 
+@lru_cache(maxsize=1)
 def get_chat_agent():
+    """One chat agent (and Gemini client) shared by all /chat requests."""
     return CodeSenseiChat()
 
 
 app = FastAPI(title="Code Sensei API", lifespan=lifespan)
 
+# Strong references to fire-and-forget tasks (the loop only keeps weak ones)
+_background_tasks: set[asyncio.Task] = set()
+
 
 origins = [
     "http://localhost:5173",
@@ -43,21 +88,38 @@ app.add_middleware(
 )
 
 
-@app.post("/analyze")
-async def analyze_code(
-    request: CodeRequest,
-    parser: Annotated[TreeSitterParser, Depends(get_parser)],
-):
-    """Analyzes code with Language Mismatch Detection."""
-    raw_code = request.code
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route templates, not raw paths, keep label cardinality bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+
+def _extract_or_fallback(
+    parser: TreeSitterParser,
+    raw_code: str,
+    language: str,
+    tree=None,
+) -> list[dict]:
+    """Parses code into function blocks, mapping parser failures to HTTP errors."""
     if not raw_code.strip():
         raise HTTPException(status_code=400, detail="Code cannot be empty")
 
-    results = []
-
     # Step A: Parse Code with Safety Check
     try:
-        functions = parser.extract_functions(raw_code, lang_name=request.language)
+        return extract_with_fallback(parser, raw_code, language, tree=tree)
 
     # Catch the Language Mismatch specifically
     except ValueError as e:
@@ -67,39 +129,197 @@ async def analyze_code(
         # Unexpected parser crashes
         raise HTTPException(status_code=500, detail=f"Parser Error: {e!s}") from e
 
-    if not functions:
-        functions = [
+
+@app.post("/analyze")
+async def analyze_code(
+    request: CodeRequest,
+    parser: Annotated[TreeSitterParser, Depends(get_parser)],
+):
+    """Analyzes code with Language Mismatch Detection."""
+    # Parsing and linting are CPU-bound: run them off the event loop
+    functions = await run_cpu(_extract_or_fallback, parser, request.code, request.language)
+
+    # Step B: Analyze all blocks concurrently (results stay in source order)
+    results = await analyze_functions(
+        functions,
+        request.language,
+        max_concurrency=request.max_concurrency,
+        use_cache=request.use_cache,
+    )
+
+    return {"results": results}
+
+
+@app.post("/analyze/stream")
+async def analyze_code_stream(
+    request: CodeRequest,
+    parser: Annotated[TreeSitterParser, Depends(get_parser)],
+):
+    """
+    Streaming variant of /analyze (NDJSON, one event per line).
+
+    Events: "functions" (parsed blocks, sent immediately), one "result" per
+    function in completion order (with its source "index"), then "summary".
+    """
+    received = time.perf_counter()
+    functions = await run_cpu(_extract_or_fallback, parser, request.code, request.language)
+
+    async def event_stream():
+        started = time.perf_counter()
+        yield _ndjson(
             {
-                "name": "Main Script",
-                "code": raw_code,
-                "start_line": 1,
-                "end_line": len(raw_code.splitlines()),
+                "event": "functions",
+                "functions": [
+                    {
+                        "index": index,
+                        "function_name": func["name"],
+                        "start_line": func["start_line"],
+                        "end_line": func["end_line"],
+                    }
+                    for index, func in enumerate(functions)
+                ],
             },
-        ]
+        )
+
+        failed = 0
+        first_result = True
+        async for index, report in iter_analyses(
+            functions,
+            request.language,
+            max_concurrency=request.max_concurrency,
+            use_cache=request.use_cache,
+        ):
+            if first_result:
+                first_result = False
+                STREAM_FIRST_RESULT_SECONDS.observe(
+                    time.perf_counter() - received,
+                    endpoint="/analyze/stream",
+                )
+            if "error" in report:
+                failed += 1
+            yield _ndjson({"event": "result", "index": index, **report})
+
+        yield _ndjson(
+            {
+                "event": "summary",
+                "total": len(functions),
+                "succeeded": len(functions) - failed,
+                "failed": failed,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000),
+            },
+        )
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+
+async def _analyze_session(
+    session_id: str,
+    session: EditorSession,
+    parser: TreeSitterParser,
+    max_concurrency: int | None,
+    use_cache: bool,  # noqa: FBT001
+) -> dict:
+    """Re-analyzes only the functions whose name or body changed since last time."""
+    functions = await run_cpu(
+        _extract_or_fallback,
+        parser,
+        session.code,
+        session.language,
+        tree=session.tree,
+    )
+    fingerprints = [function_fingerprint(func) for func in functions]
 
-    # Step B: Analyze each block
-    for func in functions:
-        print(f"🤖 Analyzing function: {func['name']} ({request.language})...")
+    results: list[dict | None] = [None] * len(functions)
+    pending = []
+    for index, (func, fingerprint) in enumerate(zip(functions, fingerprints)):
+        previous = session.reports.get(fingerprint)
+        if previous is not None:
+            # Same content, possibly moved: refresh line numbers, keep the analysis
+            results[index] = build_report(func, previous["analysis"])
+        else:
+            pending.append(index)
+
+    fresh = await analyze_functions(
+        [functions[index] for index in pending],
+        session.language,
+        max_concurrency=max_concurrency,
+        use_cache=use_cache,
+    )
+    for index, report in zip(pending, fresh):
+        results[index] = report
+
+    # Only successful analyses are worth reusing; errors get retried next time
+    session.reports = {
+        fingerprint: report
+        for fingerprint, report in zip(fingerprints, results)
+        if report and "analysis" in report
+    }
+    editor_sessions.update(session_id, session)
+
+    return {
+        "session_id": session_id,
+        "results": results,
+        "reanalyzed": len(pending),
+        "reused": len(functions) - len(pending),
+    }
+
+
+@app.post("/sessions")
+async def create_session(
+    request: CodeRequest,
+    parser: Annotated[TreeSitterParser, Depends(get_parser)],
+):
+    """Opens an incremental analysis session for an editor buffer."""
+    if not request.code.strip():
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+
+    session = await run_cpu(EditorSession, request.code, request.language)
+    session_id = editor_sessions.create(session)
+    async with session.lock:
+        return await _analyze_session(
+            session_id,
+            session,
+            parser,
+            request.max_concurrency,
+            request.use_cache,
+        )
 
+
+@app.post("/sessions/{session_id}/edits")
+async def edit_session(
+    session_id: str,
+    request: SessionEditRequest,
+    parser: Annotated[TreeSitterParser, Depends(get_parser)],
+):
+    """Applies byte-range edits, re-parses incrementally and re-analyzes what changed."""
+    session = editor_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    async with session.lock:
         try:
-            analysis = run_agent(func["code"], request.language, func["name"])
-
-            full_report = {
-                "meta": {
-                    "function_name": func["name"],
-                    "start_line": func["start_line"],
-                    "end_line": func["end_line"],
-                    "code": func["code"],
-                },
-                "analysis": analysis,
-            }
-            results.append(full_report)
+            await run_cpu(session.apply_edits, request.edits)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
 
-        except Exception as e:  # noqa: BLE001
-            print(f"⚠️ AI Analysis failed for {func['name']}: {e}")
-            results.append({"meta": func, "error": {"message": str(e)}})
+        return await _analyze_session(
+            session_id,
+            session,
+            parser,
+            request.max_concurrency,
+            request.use_cache,
+        )
 
-    return {"results": results}
+
+@app.delete("/sessions/{session_id}")
+async def close_session(session_id: str):
+    if not editor_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"status": "closed"}
 
 
 @app.get("/")
@@ -112,36 +332,81 @@ def health_check():
     }
 
 
+@app.get("/stats")
+def service_stats():
+    return {
+        "analysis_cache": analysis_cache.stats(),
+        "editor_sessions": editor_sessions.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "coalesced_analyses": agent_flights.stats(),
+        "triage": triage_stats(),
+        "feedback_writer": feedback_writer.stats(),
+        "best_answers": answer_store_stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Per-stage latency histograms in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/feedback")
-async def collect_feedback(
-    feedback: FeedbackRequest,
-    conn: Annotated[Connection, Depends(get_db)],
+async def collect_feedback(feedback: FeedbackRequest):
+    """Queues the vote for the background writer; it is committed within a few ms."""
+    vote = Vote(
+        code_hash=normalized_code_hash(feedback.code),
+        function_name=feedback.function_name,
+        code_snippet=feedback.code,
+        ai_explanation=feedback.explanation,
+        upvote=feedback.rating > 0,
+        language=feedback.language.lower() if feedback.language else None,
+    )
+    try:
+        feedback_writer.submit(vote)
+    except FeedbackQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    return {"status": "success", "message": "Signal aggregated successfully"}
+
+
+@app.get("/feedback/export")
+def export_feedback(
+    min_net_votes: int | None = None,
+    language: str | None = None,
+    since: str | None = None,
+    gzip: bool = False,  # noqa: FBT001, FBT002
 ):
-    cursor = conn.cursor()
-    normalized_code = re.sub(r"\s+", "", feedback.code)
-    code_hash = hashlib.sha256(normalized_code.encode("utf-8")).hexdigest()
-    vote_col = "upvotes" if feedback.rating > 0 else "downvotes"
+    """
+    Streams feedback rows as NDJSON (optionally gzipped) in constant memory.
 
-    try:
-        query = f"""
-            INSERT INTO feedback_loops
-            (code_hash, function_name, code_snippet, ai_explanation, {vote_col})
-            VALUES (?, ?, ?, ?, 1)
-            ON CONFLICT(code_hash, ai_explanation)
-            DO UPDATE SET
-                {vote_col} = {vote_col} + 1,
-                last_updated = CURRENT_TIMESTAMP
-        """  # noqa: S608
-        cursor.execute(
-            query,
-            (code_hash, feedback.function_name, feedback.code, feedback.explanation),
+    ``since`` is an inclusive last_updated watermark (ISO 8601) for
+    incremental exports.
+    """
+    if since:
+        try:
+            since = normalize_since(since)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"since is not an ISO 8601 timestamp: {since!r}",
+            ) from e
+
+    chunks = iter_ndjson(
+        iter_feedback_rows(
+            db_pool.path,
+            min_net_votes=min_net_votes,
+            language=language,
+            since=since,
+        ),
+    )
+    if gzip:
+        return StreamingResponse(
+            iter_gzip(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="feedback.ndjson.gz"'},
         )
-        conn.commit()
-    except Exception as e:
-        print(f"DB Error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to save feedback") from e
-    else:
-        return {"status": "success", "message": "Signal aggregated successfully"}
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
 
 
 @app.post("/chat")
@@ -149,13 +414,154 @@ async def chat_with_sensei(
     request: ChatRequest, chat_agent: Annotated[CodeSenseiChat, Depends(get_chat_agent)]
 ):
     try:
-        response_text = chat_agent.chat(
+        response_text = await chat_agent.chat(
             user_message=request.message,
             code_context=request.code_context,
             language=request.language,
             history=request.history,
         )
         return {"response": response_text}
+    except SchedulerQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
     except Exception as e:
         print(f"Chat Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/chat/sessions")
+async def create_chat_session(request: ChatSessionRequest):
+    """Stores the code context once; later turns only send the new message."""
+    session_id = chat_sessions.create(ChatSession(request.code_context, request.language))
+    return {"session_id": session_id}
+
+
+@app.post("/chat/sessions/{session_id}/messages")
+async def chat_in_session(
+    session_id: str,
+    request: ChatSessionMessage,
+    chat_agent: Annotated[CodeSenseiChat, Depends(get_chat_agent)],
+):
+    """One turn of a server-side conversation (bounded window + rolling summary)."""
+    session = chat_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    async with session.lock:
+        if request.code_context is not None:
+            session.code_context = request.code_context
+        try:
+            response_text = await chat_agent.chat(
+                user_message=request.message,
+                code_context=session.code_context,
+                language=session.language,
+                history=list(session.messages),
+                summary=session.summary,
+            )
+        except SchedulerQueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e)) from e
+        except Exception as e:
+            print(f"Chat Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e)) from e
+
+        session.add_turn(request.message, response_text)
+        overflow = session.take_overflow()
+        chat_sessions.update(session_id, session)
+
+    if overflow:
+        # Off the response path; the next turn waits on the lock if it's still running
+        task = asyncio.create_task(_compact_chat_session(session_id, session, overflow, chat_agent))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    return {"response": response_text}
+
+
+async def _compact_chat_session(
+    session_id: str,
+    session: ChatSession,
+    overflow: list,
+    chat_agent: CodeSenseiChat,
+):
+    async with session.lock:
+        try:
+            session.summary = await chat_agent.summarize(session.summary, overflow)
+        except Exception as e:  # noqa: BLE001
+            # The window budget is a hard cap: those turns are dropped either way
+            print(f"⚠️ Chat summary failed, dropping {len(overflow)} old messages: {e}")
+        session.summarized_messages += len(overflow)
+        chat_sessions.update(session_id, session)
+
+
+@app.delete("/chat/sessions/{session_id}")
+async def close_chat_session(session_id: str):
+    if not chat_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"status": "closed"}
+
+
+@app.post("/chat/stream")
+async def chat_with_sensei_stream(
+    request: ChatRequest,
+    http_request: Request,
+    chat_agent: Annotated[CodeSenseiChat, Depends(get_chat_agent)],
+):
+    """
+    Streaming variant of /chat (Server-Sent Events).
+
+    Events: "token" ({"text": ...}) as the model produces them, then "done"
+    with time-to-first-token, or "error" if generation fails midway.
+    """
+    started = time.perf_counter()
+    try:
+        chunks = await chat_agent.stream(
+            user_message=request.message,
+            code_context=request.code_context,
+            language=request.language,
+            history=request.history,
+        )
+    except SchedulerQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+
+    async def event_stream():
+        first_token_at = None
+        length = 0
+        try:
+            async for text in chunks:
+                if await http_request.is_disconnected():
+                    print("🔌 Chat client disconnected, cancelling generation")
+                    return
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    STREAM_FIRST_RESULT_SECONDS.observe(
+                        first_token_at - started,
+                        endpoint="/chat/stream",
+                    )
+                    print(f"⚡ Chat time to first token: {(first_token_at - started) * 1000:.0f} ms")
+                length += len(text)
+                yield _sse("token", {"text": text})
+        except Exception as e:  # noqa: BLE001
+            print(f"Chat Error: {e}")
+            yield _sse("error", {"message": str(e)})
+            return
+        finally:
+            # Stops the upstream generation if we leave early (disconnect or error)
+            await chunks.aclose()
+
+        yield _sse(
+            "done",
+            {
+                "ttft_ms": round((first_token_at - started) * 1000) if first_token_at else None,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000),
+                "characters": length,
+            },
+        )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,302 @@
+"""
+Repository-scale batch analysis.
+
+Parses and lints many files (directories, single files or .zip/.tar
+archives) in a process pool, dedupes identical functions across files,
+feeds the LLM work through a bounded queue and appends one JSON line per
+result to the output file. Re-running with the same output resumes:
+files whose functions all succeeded are skipped, analyzed functions are
+not redone, and failed ones are retried (the newest line per function
+wins).
+
+    python batch_analyze.py src/ vendor.zip --output results.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from ai_agent import run_agent_async
+from analysis_pipeline import extract_with_fallback
+from database import normalized_code_hash
+from llm_scheduler import Priority
+from parser_engine import get_parser
+
+EXTENSION_LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".ts": "javascript",
+    ".tsx": "javascript",
+    ".java": "java",
+    ".c": "cpp",
+    ".h": "cpp",
+    ".cc": "cpp",
+    ".cpp": "cpp",
+    ".cxx": "cpp",
+    ".hpp": "cpp",
+    ".cs": "csharp",
+}
+
+SKIPPED_DIRS = {".git", "node_modules", "venv", ".venv", "__pycache__", "build", "dist"}
+
+
+def detect_language(name: str) -> str | None:
+    return EXTENSION_LANGUAGES.get(Path(name).suffix.lower())
+
+
+def iter_sources(paths: list[str]):
+    """Yields (label, language, code) for every supported file in the inputs."""
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_dir():
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+                for name in sorted(files):
+                    file_path = Path(root) / name
+                    language = detect_language(name)
+                    if language:
+                        yield str(file_path), language, file_path.read_text("utf8", "replace")
+        elif zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for member in archive.infolist():
+                    language = detect_language(member.filename)
+                    if language and not member.is_dir():
+                        code = archive.read(member).decode("utf8", "replace")
+                        yield f"{path}!{member.filename}", language, code
+        elif tarfile.is_tarfile(path):
+            with tarfile.open(path) as archive:
+                for member in archive:
+                    language = detect_language(member.name)
+                    extracted = archive.extractfile(member) if member.isfile() else None
+                    if language and extracted:
+                        code = extracted.read().decode("utf8", "replace")
+                        yield f"{path}!{member.name}", language, code
+        elif path.is_file() and detect_language(path.name):
+            yield str(path), detect_language(path.name), path.read_text("utf8", "replace")
+
+
+def parse_source(label: str, language: str, code: str) -> dict:
+    """Process-pool stage: CPU-bound parsing and linting of one file."""
+    try:
+        functions = extract_with_fallback(get_parser(), code, language)
+    except Exception as e:  # noqa: BLE001
+        return {"file": label, "error": str(e)}
+    return {"file": label, "functions": functions}
+
+
+class ResultLog:
+    """Append-only JSONL output that also remembers what an earlier run finished."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.done_files: set[tuple[str, str]] = set()
+        self.done_functions: set[tuple[str, str, str, int]] = set()
+        self._load()
+        self._handle = self.path.open("a", encoding="utf8")
+        if self.path.stat().st_size and not self._ends_with_newline():
+            # A crash may have cut the last line short; start on a fresh one
+            self._handle.write("\n")
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                key = (record.get("file"), record.get("file_hash"))
+                if record.get("event") == "file_done":
+                    self.done_files.add(key)
+                elif record.get("event") == "function" and "analysis" in record:
+                    self.done_functions.add(
+                        (*key, record.get("function_name"), record.get("start_line")),
+                    )
+
+    def _ends_with_newline(self) -> bool:
+        with self.path.open("rb") as handle:
+            handle.seek(-1, os.SEEK_END)
+            return handle.read(1) == b"\n"
+
+    def write(self, record: dict):
+        self._handle.write(json.dumps(record) + "\n")
+        self._handle.flush()
+
+    def close(self):
+        self._handle.close()
+
+
+class BatchRunner:
+    def __init__(self, log: ResultLog, llm_concurrency: int, queue_size: int, use_cache: bool):  # noqa: FBT001
+        self.log = log
+        self.llm_concurrency = llm_concurrency
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.use_cache = use_cache
+        # (normalized code hash, language) -> analysis future, while it is pending
+        self.inflight: dict[tuple[str, str], asyncio.Future] = {}
+        self.stats = {
+            "files": 0,
+            "files_skipped": 0,
+            "file_errors": 0,
+            "functions": 0,
+            "functions_skipped": 0,
+            "deduped": 0,
+            "analysis_errors": 0,
+        }
+
+    async def _llm_worker(self):
+        while True:
+            key, func, language, future = await self.queue.get()
+            try:
+                analysis = await run_agent_async(
+                    func["code"],
+                    language,
+                    func["name"],
+                    use_cache=self.use_cache,
+                    linter_errors=func.get("linter_errors"),
+                    priority=Priority.BULK,
+                    generated_file=func.get("generated_file", False),
+                )
+            except Exception as e:  # noqa: BLE001
+                future.set_exception(e)
+            else:
+                future.set_result(analysis)
+            finally:
+                # Later duplicates start fresh (a cache hit once this succeeded),
+                # so results don't pile up and a failure isn't replayed to them
+                del self.inflight[key]
+                self.queue.task_done()
+
+    async def _analysis_for(self, func: dict, language: str) -> dict:
+        key = (normalized_code_hash(func["code"]), language)
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.inflight[key] = future
+            # Blocks while the queue is full: back-pressure on the parse stage
+            await self.queue.put((key, func, language, future))
+        else:
+            self.stats["deduped"] += 1
+        return await asyncio.shield(future)
+
+    async def _analyze_file(self, label: str, file_hash: str, language: str, functions: list):
+        async def one(func: dict) -> bool:
+            record = {
+                "event": "function",
+                "file": label,
+                "file_hash": file_hash,
+                "language": language,
+                "function_name": func["name"],
+                "start_line": func["start_line"],
+                "end_line": func["end_line"],
+            }
+            try:
+                record["analysis"] = await self._analysis_for(func, language)
+            except Exception as e:  # noqa: BLE001
+                self.stats["analysis_errors"] += 1
+                record["error"] = {"message": str(e)}
+            self.log.write(record)
+            return "analysis" in record
+
+        pending = [
+            func
+            for func in functions
+            if (label, file_hash, func["name"], func["start_line"]) not in self.log.done_functions
+        ]
+        self.stats["functions"] += len(pending)
+        self.stats["functions_skipped"] += len(functions) - len(pending)
+        succeeded = await asyncio.gather(*(one(func) for func in pending))
+        if not all(succeeded):
+            # Not marked done, so a rerun retries the failed functions
+            return
+        self.log.write(
+            {
+                "event": "file_done",
+                "file": label,
+                "file_hash": file_hash,
+                "functions": len(functions),
+            },
+        )
+
+    async def run(self, paths: list[str], workers: int):
+        loop = asyncio.get_running_loop()
+        llm_workers = [
+            asyncio.create_task(self._llm_worker()) for _ in range(self.llm_concurrency)
+        ]
+        file_tasks = []
+        # Bounds how many files (source text + parsed functions) are in flight
+        file_slots = asyncio.Semaphore(workers * 4)
+
+        async def handle(pool, label: str, language: str, code: str):
+            try:
+                file_hash = normalized_code_hash(code)
+                if (label, file_hash) in self.log.done_files:
+                    self.stats["files_skipped"] += 1
+                    return
+                if not code.strip():
+                    return
+
+                parsed = await loop.run_in_executor(pool, parse_source, label, language, code)
+                self.stats["files"] += 1
+
+                if "error" in parsed:
+                    self.stats["file_errors"] += 1
+                    self.log.write(
+                        {
+                            "event": "file_error",
+                            "file": label,
+                            "file_hash": file_hash,
+                            "error": {"message": parsed["error"]},
+                        },
+                    )
+                    return
+                await self._analyze_file(label, file_hash, language, parsed["functions"])
+            finally:
+                file_slots.release()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for label, language, code in iter_sources(paths):
+                await file_slots.acquire()
+                file_tasks.append(asyncio.create_task(handle(pool, label, language, code)))
+            await asyncio.gather(*file_tasks)
+
+        for worker in llm_workers:
+            worker.cancel()
+
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-analyze files, directories or archives.")
+    parser.add_argument("paths", nargs="+", help="Files, directories, .zip or .tar(.gz) archives")
+    parser.add_argument("--output", "-o", default="analysis_results.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the analysis cache")
+    args = parser.parse_args()
+
+    log = ResultLog(args.output)
+    runner = BatchRunner(
+        log,
+        llm_concurrency=args.llm_concurrency,
+        queue_size=args.queue_size,
+        use_cache=not args.no_cache,
+    )
+    try:
+        stats = asyncio.run(runner.run(args.paths, args.workers))
+    finally:
+        log.close()
+    print(f"✅ Batch complete: {json.dumps(stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Do slow requests still freeze the worker? A concurrency check for the event loop.
+
+Runs the app in-process with the stub LLM at a fixed latency (see
+load_test.py), fires --requests concurrent /chat and /analyze calls, and
+meanwhile probes GET / every PROBE_INTERVAL_S. On a non-blocking server
+the burst finishes in about one LLM latency and the health check stays
+fast; if a handler blocks the loop, requests serialize (the burst takes
+~N latencies) and the probe stalls behind them. Exits 1 in that case.
+
+    python benchmarks/bench_event_loop.py [--requests 8] [--latency-ms 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from load_test import analyze_payload, chat_payload, configure_in_process, percentile  # noqa: E402
+
+PROBE_INTERVAL_S = 0.02
+# A burst may take this many LLM latencies (batching, scheduling) and still count as parallel
+MAX_BURST_LATENCIES = 3
+MAX_PROBE_MS = 250
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/")
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(PROBE_INTERVAL_S)
+    return latencies
+
+
+async def burst(client: httpx.AsyncClient, path: str, payloads: list[dict]) -> tuple[float, int]:
+    """(seconds until every request answered, number of non-200 answers)."""
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(client.post(path, json=payload) for payload in payloads))
+    failed = sum(response.status_code != 200 for response in responses)  # noqa: PLR2004
+    return time.perf_counter() - started, failed
+
+
+async def run(requests: int) -> list[dict]:
+    from backend import app  # noqa: PLC0415
+
+    results = []
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://event-loop-check",
+        timeout=300,
+    ) as client:
+        for path, make_payload in (("/chat", chat_payload), ("/analyze", analyze_payload)):
+            stop = asyncio.Event()
+            prober = asyncio.create_task(probe(client, stop))
+            elapsed, failed = await burst(client, path, [make_payload(i) for i in range(requests)])
+            stop.set()
+            probes = sorted(await prober)
+            results.append(
+                {
+                    "endpoint": path,
+                    "seconds": elapsed,
+                    "failed": failed,
+                    "probe_p99_ms": percentile(probes, 99),
+                    "probe_max_ms": probes[-1] if probes else 0.0,
+                },
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that slow requests run concurrently.")
+    parser.add_argument("--requests", "-n", type=int, default=8)
+    parser.add_argument("--latency-ms", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Before backend (and so stub_llm) is imported
+    os.environ["LLM_STUB_LATENCY"] = f"fixed:{args.latency_ms}"
+    os.environ["LLM_STUB_ERROR_RATE"] = "0"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_in_process(workdir)
+        results = asyncio.run(run(args.requests))
+
+    latency_s = args.latency_ms / 1000
+    print(
+        f"\n{args.requests} concurrent requests, stub LLM latency {args.latency_ms} ms "
+        f"(serialized would take ≥ {args.requests * latency_s:.1f} s)",
+    )
+    print(f"{'endpoint':<10} {'burst s':>8} {'failed':>7} {'probe p99 ms':>13} {'probe max ms':>13}")
+    blocked = False
+    for result in results:
+        print(
+            f"{result['endpoint']:<10} {result['seconds']:>8.2f} {result['failed']:>7} "
+            f"{result['probe_p99_ms']:>13.1f} {result['probe_max_ms']:>13.1f}",
+        )
+        blocked = blocked or (
+            result["seconds"] > MAX_BURST_LATENCIES * latency_s
+            or result["probe_max_ms"] > MAX_PROBE_MS
+        )
+
+    if blocked:
+        print("❌ Requests serialized or the health check stalled: something blocks the event loop.")
+        sys.exit(1)
+    print("✅ Slow requests ran concurrently and the event loop stayed responsive.")
+
+
+if __name__ == "__main__":
+    main()
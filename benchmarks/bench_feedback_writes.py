@@ -0,0 +1,103 @@
+"""
+Sustained /feedback write throughput: per-request commits vs group commit.
+
+Simulates a vote storm (many concurrent voters on a small set of hot
+explanations) against a throwaway database. The legacy path opens a
+connection and commits once per vote, as /feedback used to; the writer
+path enqueues votes for FeedbackWriter and counts the time until the last
+one is committed.
+
+    python benchmarks/bench_feedback_writes.py [votes] [threads]
+"""
+
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import ConnectionPool, create_table, open_connection  # noqa: E402
+from feedback_writer import FeedbackWriter, Vote  # noqa: E402
+
+HOT_EXPLANATIONS = 50
+
+LEGACY_UPSERT = """
+    INSERT INTO feedback_loops
+    (code_hash, function_name, code_snippet, ai_explanation, {vote_col})
+    VALUES (?, ?, ?, ?, 1)
+    ON CONFLICT(code_hash, ai_explanation)
+    DO UPDATE SET
+        {vote_col} = {vote_col} + 1,
+        last_updated = CURRENT_TIMESTAMP
+"""
+
+
+def make_vote(index: int) -> Vote:
+    target = index % HOT_EXPLANATIONS
+    return Vote(
+        code_hash=f"hash-{target}",
+        function_name=f"func_{target}",
+        code_snippet=f"def func_{target}(): pass",
+        ai_explanation=f"explanation {target}",
+        upvote=index % 3 != 0,
+    )
+
+
+def legacy_vote(path: str, vote: Vote):
+    conn = open_connection(path)
+    try:
+        vote_col = "upvotes" if vote.upvote else "downvotes"
+        conn.execute(
+            LEGACY_UPSERT.format(vote_col=vote_col),
+            (vote.code_hash, vote.function_name, vote.code_snippet, vote.ai_explanation),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def total_votes(path: str) -> int:
+    conn = open_connection(path)
+    try:
+        return conn.execute("SELECT SUM(upvotes + downvotes) FROM feedback_loops").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def bench_legacy(path: str, votes: int, threads: int) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda index: legacy_vote(path, make_vote(index)), range(votes)))
+    return time.perf_counter() - started
+
+
+def bench_writer(path: str, votes: int, threads: int) -> float:
+    pool = ConnectionPool(path, size=1)
+    writer = FeedbackWriter(pool=pool)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda index: writer.submit(make_vote(index)), range(votes)))
+    writer.stop()
+    elapsed = time.perf_counter() - started
+    pool.close()
+    return elapsed
+
+
+def main():
+    votes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16  # noqa: PLR2004
+
+    print(f"{votes} votes from {threads} threads on {HOT_EXPLANATIONS} hot explanations")
+    print(f"{'path':>14} {'seconds':>9} {'votes/s':>10} {'stored':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bench in (("per-request", bench_legacy), ("group commit", bench_writer)):
+            path = str(Path(tmp) / f"{name.replace(' ', '_')}.db")
+            create_table(path)
+            elapsed = bench(path, votes, threads)
+            print(f"{name:>14} {elapsed:>9.2f} {votes / elapsed:>10.0f} {total_votes(path):>8}")
+
+
+if __name__ == "__main__":
+    main()
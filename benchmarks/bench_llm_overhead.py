@@ -0,0 +1,79 @@
+"""
+Per-call overhead of building the expert chain, with the LLM stubbed out.
+
+Compares the legacy path (new Gemini client + structured-output binding +
+prompt template on every call) with the shared registry. Only the setup and
+prompt rendering are timed; no network request is made.
+
+    python benchmarks/bench_llm_overhead.py [iterations]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "stub-key-for-benchmarking")
+
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+from langchain_google_genai import ChatGoogleGenerativeAI  # noqa: E402
+
+from experts.base_expert import get_expert_chain  # noqa: E402
+from llm_registry import EXPERT_MODEL  # noqa: E402
+from schemas import CodeSenseiAnalysis  # noqa: E402
+
+LANG_LABEL = "Python"
+INSTRUCTIONS = "Focus on idiomatic Python."
+PROMPT_INPUT = {
+    "lang": LANG_LABEL,
+    "name": "add",
+    "code": "def add(a, b):\n    return a + b",
+    "linter_context": "",
+}
+
+
+def legacy_call():
+    llm = ChatGoogleGenerativeAI(
+        model=EXPERT_MODEL,
+        temperature=0,
+        google_api_key=os.environ["GOOGLE_API_KEY"],
+    )
+    structured_llm = llm.with_structured_output(CodeSenseiAnalysis)
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                f"You are a Senior {LANG_LABEL} Engineer. {INSTRUCTIONS}{{linter_context}}",
+            ),
+            ("human", "Analyze this {lang} function named '{name}':\n\n{code}"),
+        ],
+    )
+    chain = prompt | structured_llm
+    return chain.first.invoke(PROMPT_INPUT)
+
+
+def registry_call():
+    chain = get_expert_chain(LANG_LABEL, INSTRUCTIONS)
+    return chain.first.invoke(PROMPT_INPUT)
+
+
+def bench(label, fn, iterations):
+    fn()  # warm-up (imports, first registry build)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call_ms = (time.perf_counter() - started) * 1000 / iterations
+    print(f"{label:<10} {per_call_ms:8.3f} ms/call")
+    return per_call_ms
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    legacy = bench("legacy", legacy_call, iterations)
+    registry = bench("registry", registry_call, iterations)
+    print(f"speedup    {legacy / registry:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
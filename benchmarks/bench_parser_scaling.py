@@ -0,0 +1,68 @@
+"""
+Scaling benchmark for TreeSitterParser.extract_functions.
+
+Generates Python files of increasing size (a few globals plus many small
+functions that reference them) and reports wall time per size. Linear
+extraction shows a roughly constant ms per 1k lines.
+
+    python benchmarks/bench_parser_scaling.py [max_lines]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parser_engine import TreeSitterParser  # noqa: E402
+
+LINES_PER_FUNCTION = 5
+
+
+def generate_source(target_lines: int) -> str:
+    parts = [
+        "class Config:",
+        "    retries = 3",
+        "",
+        "LIMIT = 10",
+        "",
+    ]
+    index = 0
+    while len(parts) < target_lines:
+        parts.extend(
+            [
+                f"def handler_{index}(items):",
+                "    cfg = Config()",
+                "    total = sum(i for i in items if i < LIMIT)",
+                "    return total * cfg.retries",
+                "",
+            ],
+        )
+        index += 1
+    return "\n".join(parts)
+
+
+def time_extraction(parser: TreeSitterParser, code: str, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        parser.extract_functions(code, "python")
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    max_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    sizes = [size for size in (1000, 2500, 5000, 10000, 20000, 40000) if size <= max_lines]
+
+    parser = TreeSitterParser()
+    print(f"{'lines':>8} {'functions':>10} {'ms':>10} {'ms/1k lines':>12}")
+    for size in sizes:
+        code = generate_source(size)
+        elapsed_ms = time_extraction(parser, code)
+        functions = size // LINES_PER_FUNCTION
+        print(f"{size:>8} {functions:>10} {elapsed_ms:>10.1f} {elapsed_ms / size * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Benchmark suite for TreeSitterParser.extract_functions with regression gates.
+
+Generates synthetic sources for every language in STRATEGIES in five
+shapes (many small functions, a few huge ones, deep nesting, many globals
+and a high syntax-error rate) at several sizes, and measures per case:
+
+- wall time: best run, parse included (ms). Each case runs at least
+  --repeats times and keeps going for SAMPLE_S (the minimum of many runs
+  is what stays stable on a busy host), but slow cases stop after
+  REPEAT_BUDGET_S. Recording a baseline samples for BASELINE_SAMPLE_S,
+  so a noisy moment does not become the bar every later run is held to
+- peak_kib: peak Python heap traced by tracemalloc during one run
+- blocks: Python allocations still alive when the run returns (the result)
+
+tree-sitter's own C allocations are not visible to tracemalloc, so the
+memory figures cover the payloads we build, not the syntax tree itself.
+
+Results are written as JSON and compared against a stored baseline.
+Changed output or memory growth beyond the tolerance is deterministic and
+fails the run (exit status 1). A case slower than the tolerance allows is
+measured again and, if it still is, reported; it only fails the run with
+--fail-on-time, because wall time on a shared host swings by 2x between
+quiet and busy moments.
+
+    python benchmarks/bench_parser_suite.py                    # compare to baseline
+    python benchmarks/bench_parser_suite.py --quick            # smaller sizes only
+    python benchmarks/bench_parser_suite.py --update-baseline  # accept current numbers
+
+Wall times only compare meaningfully on the machine that recorded the
+baseline; re-record it after moving hosts.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import NamedTuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parser_engine import STRATEGIES, TreeSitterParser  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "parser_suite.json"
+
+SIZES = (500, 2000, 8000)
+QUICK_SIZES = (500, 2000)
+
+# A case regresses when it is slower/bigger by this fraction AND by the
+# absolute floor (tiny cases jitter by more than a millisecond on their own)
+TIME_TOLERANCE = 0.5
+TIME_FLOOR_MS = 1.0
+MEMORY_TOLERANCE = 0.10
+MEMORY_FLOOR_KIB = 64
+
+NESTING_DEPTH = 24
+GLOBALS_PER_FUNCTION = 3
+ERROR_LINE_RATE = 0.15
+SEED = 1234
+
+SAMPLE_S = 0.5
+BASELINE_SAMPLE_S = 2.0
+REPEAT_BUDGET_S = 2.0
+MAX_RUNS = 1000
+CONFIRM_REPEATS = 10
+
+
+class Syntax(NamedTuple):
+    prelude: list[str]
+    epilogue: list[str]
+    member_indent: str
+    global_decl: str
+    function_open: str
+    statement: str
+    block_open: str
+    closer: str | None  # None: indentation-delimited blocks
+    ret: str
+
+
+SYNTAX = {
+    "python": Syntax(
+        prelude=["import math", ""],
+        epilogue=[],
+        member_indent="",
+        global_decl="LIMIT_{i} = {i}",
+        function_open="def handler_{i}(items):",
+        statement="value_{j} = compute(items, LIMIT_{g})",
+        block_open="if items[{d}] > {d}:",
+        closer=None,
+        ret="return value_0",
+    ),
+    "javascript": Syntax(
+        prelude=["'use strict';", ""],
+        epilogue=[],
+        member_indent="",
+        global_decl="const LIMIT_{i} = {i};",
+        function_open="function handler_{i}(items) {{",
+        statement="const value_{j} = compute(items, LIMIT_{g});",
+        block_open="if (items[{d}] > {d}) {{",
+        closer="}",
+        ret="return value_0;",
+    ),
+    "cpp": Syntax(
+        prelude=["#include <vector>", ""],
+        epilogue=[],
+        member_indent="",
+        global_decl="const int LIMIT_{i} = {i};",
+        function_open="int handler_{i}(const std::vector<int>& items) {{",
+        statement="int value_{j} = compute(items, LIMIT_{g});",
+        block_open="if (items[{d}] > {d}) {{",
+        closer="}",
+        ret="return value_0;",
+    ),
+    "java": Syntax(
+        prelude=["public class Generated {"],
+        epilogue=["}"],
+        member_indent="    ",
+        global_decl="static final int LIMIT_{i} = {i};",
+        function_open="static int handler_{i}(int[] items) {{",
+        statement="int value_{j} = compute(items, LIMIT_{g});",
+        block_open="if (items[{d}] > {d}) {{",
+        closer="}",
+        ret="return value_0;",
+    ),
+    "csharp": Syntax(
+        prelude=["public class Generated {"],
+        epilogue=["}"],
+        member_indent="    ",
+        global_decl="const int LIMIT_{i} = {i};",
+        function_open="static int Handler{i}(int[] items) {{",
+        statement="int value_{j} = Compute(items, LIMIT_{g});",
+        block_open="if (items[{d}] > {d}) {{",
+        closer="}",
+        ret="return value_0;",
+    ),
+}
+
+
+def _function(syntax: Syntax, index: int, statements: int, globals_count: int, depth: int = 0):
+    """One function whose innermost block (``depth`` levels down) holds the statements."""
+    rng = random.Random(index)
+    pad = syntax.member_indent
+    lines = [pad + syntax.function_open.format(i=index)]
+    for level in range(depth):
+        lines.append(pad + "    " * (level + 1) + syntax.block_open.format(d=level))
+    body = pad + "    " * (depth + 1)
+    lines.extend(
+        body + syntax.statement.format(j=j, g=rng.randrange(globals_count))
+        for j in range(statements)
+    )
+    lines.append(body + syntax.ret)
+    if syntax.closer is not None:
+        lines.extend(pad + "    " * level + syntax.closer for level in range(depth, -1, -1))
+    lines.append("")
+    return lines
+
+
+def _file(syntax: Syntax, globals_count: int, functions: list[list[str]]) -> str:
+    lines = list(syntax.prelude)
+    lines.extend(
+        syntax.member_indent + syntax.global_decl.format(i=i) for i in range(globals_count)
+    )
+    lines.append("")
+    for function in functions:
+        lines.extend(function)
+    lines.extend(syntax.epilogue)
+    return "\n".join(lines)
+
+
+def _fill(syntax: Syntax, target_lines: int, globals_count: int, **shape) -> str:
+    """Adds functions of one shape until the file reaches target_lines."""
+    functions, total, index = [], globals_count, 0
+    while total < target_lines:
+        function = _function(syntax, index, globals_count=globals_count, **shape)
+        functions.append(function)
+        total += len(function)
+        index += 1
+    return _file(syntax, globals_count, functions)
+
+
+def many_small(syntax: Syntax, lines: int) -> str:
+    return _fill(syntax, lines, globals_count=8, statements=3)
+
+
+def few_huge(syntax: Syntax, lines: int) -> str:
+    functions = [_function(syntax, i, lines // 3, globals_count=8) for i in range(3)]
+    return _file(syntax, 8, functions)
+
+
+def deep_nesting(syntax: Syntax, lines: int) -> str:
+    return _fill(syntax, lines, globals_count=8, statements=2, depth=NESTING_DEPTH)
+
+
+def many_globals(syntax: Syntax, lines: int) -> str:
+    # Half the file is globals, and every function references a few of them
+    globals_count = lines // 2
+    return _fill(syntax, lines, globals_count=globals_count, statements=GLOBALS_PER_FUNCTION)
+
+
+def high_error_rate(syntax: Syntax, lines: int) -> str:
+    """many_small with a share of lines cut in half (unbalanced brackets and dangling tokens)."""
+    rng = random.Random(SEED)
+    damaged = []
+    for line in many_small(syntax, lines).splitlines():
+        if line.strip() and rng.random() < ERROR_LINE_RATE:
+            line = line[: len(line) // 2]
+        damaged.append(line)
+    return "\n".join(damaged)
+
+
+SHAPES = {
+    "many_small": many_small,
+    "few_huge": few_huge,
+    "deep_nesting": deep_nesting,
+    "many_globals": many_globals,
+    "high_error_rate": high_error_rate,
+}
+
+
+def _extract(parser: TreeSitterParser, code: str, language: str):
+    """extract_functions; rejecting broken input is an outcome, not a failure."""
+    try:
+        return parser.extract_functions(code, language)
+    except ValueError:
+        return None
+
+
+def measure(
+    parser: TreeSitterParser,
+    code: str,
+    language: str,
+    repeats: int,
+    sample_s: float = SAMPLE_S,
+) -> dict:
+    best = float("inf")
+    functions = None
+    first_started = time.perf_counter()
+    for run in range(1, MAX_RUNS + 1):
+        started = time.perf_counter()
+        functions = _extract(parser, code, language)
+        best = min(best, time.perf_counter() - started)
+        elapsed = time.perf_counter() - first_started
+        if elapsed > max(REPEAT_BUDGET_S, sample_s) or (run >= repeats and elapsed > sample_s):
+            break
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = _extract(parser, code, language)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del result
+
+    return {
+        "lines": code.count("\n") + 1,
+        "functions": len(functions) if functions is not None else 0,
+        "rejected": functions is None,
+        "ms": round(best * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "blocks": blocks,
+    }
+
+
+def measure_case(
+    parser: TreeSitterParser,
+    key: str,
+    repeats: int,
+    sample_s: float = SAMPLE_S,
+) -> dict:
+    """Measures one "language/shape/lines" case."""
+    language, shape, size = key.split("/")
+    code = SHAPES[shape](SYNTAX[language], int(size))
+    case = measure(parser, code, language, repeats, sample_s)
+    print(
+        f"{key:<36} {case['functions']:>6} fn {case['ms']:>9.2f} ms "
+        f"{case['peak_kib']:>9.1f} KiB peak {case['blocks']:>7} blocks"
+        + ("  (rejected)" if case["rejected"] else ""),
+    )
+    return case
+
+
+def run_suite(sizes, repeats: int, languages, shapes, sample_s: float = SAMPLE_S) -> dict:
+    parser = TreeSitterParser()
+    cases = {
+        key: measure_case(parser, key, repeats, sample_s)
+        for key in (
+            f"{language}/{shape}/{size}"
+            for language in languages
+            for shape in shapes
+            for size in sizes
+        )
+    }
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "cases": cases,
+    }
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    time_tolerance: float,
+    memory_tolerance: float,
+) -> list[tuple[str, str, str]]:
+    """(case, kind, message) for every case outside the bounds; kind is output, memory or time."""
+    regressions = []
+    for key, case in results["cases"].items():
+        old = baseline["cases"].get(key)
+        if old is None:
+            continue
+        if case["rejected"] != old["rejected"] or case["functions"] != old["functions"]:
+            regressions.append(
+                (
+                    key,
+                    "output",
+                    f"{key}: output changed ({old['functions']} -> {case['functions']} "
+                    f"functions, rejected {old['rejected']} -> {case['rejected']})",
+                ),
+            )
+        checks = (
+            ("memory", "peak_kib", "KiB", memory_tolerance, MEMORY_FLOOR_KIB),
+            ("time", "ms", "ms", time_tolerance, TIME_FLOOR_MS),
+        )
+        for kind, metric, unit, tolerance, floor in checks:
+            limit = max(old[metric] * (1 + tolerance), old[metric] + floor)
+            if case[metric] > limit:
+                growth = (case[metric] / old[metric] - 1) * 100 if old[metric] else 0
+                regressions.append(
+                    (
+                        key,
+                        kind,
+                        f"{key}: {old[metric]} -> {case[metric]} {unit} (+{growth:.0f}%)",
+                    ),
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="extract_functions benchmark suite.")
+    parser.add_argument("--quick", action="store_true", help=f"Sizes {QUICK_SIZES} only")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--language", action="append", choices=sorted(STRATEGIES))
+    parser.add_argument("--shape", action="append", choices=sorted(SHAPES))
+    parser.add_argument("--output", "-o", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument(
+        "--fail-on-time",
+        action="store_true",
+        help="Exit 1 on wall-time regressions too (use on quiet, dedicated hosts)",
+    )
+    args = parser.parse_args()
+
+    results = run_suite(
+        QUICK_SIZES if args.quick else SIZES,
+        args.repeats,
+        args.language or list(STRATEGIES),
+        args.shape or list(SHAPES),
+        BASELINE_SAMPLE_S if args.update_baseline else SAMPLE_S,
+    )
+
+    if args.update_baseline:
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+        if args.baseline.exists():
+            # Keep cases this run did not cover (e.g. after --quick or --language)
+            previous = json.loads(args.baseline.read_text())
+            results["cases"] = {**previous["cases"], **results["cases"]}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"✅ Baseline updated: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"⚠️ No baseline at {args.baseline}; run with --update-baseline to record one.")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("platform") != results["platform"]:
+        print(f"⚠️ Baseline was recorded on {baseline.get('platform')}; times may not compare.")
+
+    tolerances = (args.time_tolerance, args.memory_tolerance)
+    regressions = compare(results, baseline, *tolerances)
+    slow = list(dict.fromkeys(key for key, kind, _ in regressions if kind == "time"))
+    if slow:
+        print(f"🔁 Re-measuring {len(slow)} slow case(s)...")
+        extractor = TreeSitterParser()
+        for key in slow:
+            again = measure_case(extractor, key, CONFIRM_REPEATS)
+            # Noise only ever adds time, so the faster of the two runs stands
+            results["cases"][key]["ms"] = min(again["ms"], results["cases"][key]["ms"])
+        regressions = compare(results, baseline, *tolerances)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+    failing = [
+        message
+        for _, kind, message in regressions
+        if kind != "time" or args.fail_on_time
+    ]
+    warnings = [message for _, kind, message in regressions if message not in failing]
+    if warnings:
+        print(f"⚠️ {len(warnings)} case(s) slower than the baseline allows:")
+        for message in warnings:
+            print(f"   {message}")
+    if failing:
+        print(f"❌ {len(failing)} regression(s) against {args.baseline.name}:")
+        for message in failing:
+            print(f"   {message}")
+        sys.exit(1)
+    print(f"✅ No output or memory regressions against {args.baseline.name}")
+
+
+if __name__ == "__main__":
+    main()
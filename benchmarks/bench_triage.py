@@ -0,0 +1,150 @@
+"""
+Does static triage route what it should? A routing check for the triage node.
+
+Runs small multi-function files through the real /analyze pipeline
+(extract_with_fallback + analyze_functions) with the stub LLM and counts
+the LLM calls the scheduler admits:
+
+- a file opening with a generator banner must get templated answers for
+  every function and cost no LLM call;
+- the same functions without the banner must reach the LLM;
+- risky one-liners (eval, system, strcpy, ...) must never be templated,
+  while plain getters and setters must be.
+
+Exits 1 on any misroute.
+
+    python benchmarks/bench_triage.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from load_test import configure_in_process  # noqa: E402
+
+PYTHON_FUNCTIONS = (
+    "def total(items):\n"
+    "    result = 0\n"
+    "    for item in items:\n"
+    "        for part in item:\n"
+    "            result += part\n"
+    "    return result\n"
+    "\n\n"
+    "def scale(values, factor):\n"
+    "    out = []\n"
+    "    for value in values:\n"
+    "        if value:\n"
+    "            out.append(value * factor)\n"
+    "    return out\n"
+    "\n\n"
+    "def pick(rows, key):\n"
+    "    return [row[key] for row in rows if key in row]\n"
+)
+
+JS_FUNCTIONS = (
+    "function total(items) {\n"
+    "  let result = 0;\n"
+    "  for (const item of items) {\n"
+    "    for (const part of item) { result += part; }\n"
+    "  }\n"
+    "  return result;\n"
+    "}\n"
+    "\n"
+    "function scale(values, factor) {\n"
+    "  return values.filter(Boolean).map((value) => value * factor);\n"
+    "}\n"
+)
+
+BANNERS = {
+    "python": "# @generated by protoc-gen-python. DO NOT EDIT.\n\n",
+    "javascript": "// Code generated by a tool. DO NOT EDIT.\n\n",
+}
+
+SOURCES = {"python": PYTHON_FUNCTIONS, "javascript": JS_FUNCTIONS}
+
+# (language, code, should be templated)
+ONE_LINERS = (
+    ("python", "def run(a):\n    return eval(a)\n", False),
+    ("python", "def wipe(q):\n    os.system('rm -rf ' + q)\n", False),
+    (
+        "java",
+        'ResultSet find(String q) { return stmt.executeQuery("SELECT * FROM t WHERE a=" + q); }',
+        False,
+    ),
+    ("javascript", "function show(u) { el.innerHTML = u; }", False),
+    ("cpp", "void copy(char* s) { strcpy(buf, s); }", False),
+    ("python", "def name(self):\n    return self._name\n", True),
+    ("python", "def set_name(self, value):\n    self._name = value\n", True),
+    ("java", "String getName() { return this.name; }", True),
+)
+
+
+async def analyze_file(code: str, language: str) -> tuple[list[dict], int]:
+    """(reports, LLM calls admitted while analyzing this file)."""
+    from analysis_pipeline import analyze_functions, extract_with_fallback  # noqa: PLC0415
+    from llm_scheduler import llm_scheduler  # noqa: PLC0415
+    from parser_engine import get_parser  # noqa: PLC0415
+
+    functions = extract_with_fallback(get_parser(), code, language)
+    before = llm_scheduler.stats()["admitted"]
+    reports = await analyze_functions(functions, language, use_cache=False)
+    return reports, llm_scheduler.stats()["admitted"] - before
+
+
+async def check_banners() -> list[str]:
+    failures = []
+    for language, functions in SOURCES.items():
+        reports, calls = await analyze_file(BANNERS[language] + functions, language)
+        templated = sum(
+            report["analysis"]["complexity_estimate"] == "N/A" for report in reports
+        )
+        print(
+            f"{language:<11} bannered: {len(reports)} functions, "
+            f"{templated} templated, {calls} LLM calls",
+        )
+        if len(reports) < 2 or templated != len(reports) or calls:  # noqa: PLR2004
+            failures.append(f"{language}: bannered file was not fully templated")
+
+        reports, calls = await analyze_file(functions, language)
+        print(f"{language:<11} plain:    {len(reports)} functions, {calls} LLM calls")
+        if not calls:
+            failures.append(f"{language}: file without a banner never reached the LLM")
+    return failures
+
+
+def check_one_liners() -> list[str]:
+    from triage import classify, compute_metrics  # noqa: PLC0415
+
+    failures = []
+    for language, code, expected in ONE_LINERS:
+        tier = classify(compute_metrics(code, language), [])
+        print(f"{tier:<9} {language:<11} {code.splitlines()[0][:60]}")
+        if (tier == "template") != expected:
+            failures.append(f"{language}: {code.splitlines()[0]!r} routed to {tier}")
+    return failures
+
+
+def main():
+    # Before the pipeline (and so stub_llm) is imported
+    os.environ["LLM_STUB_LATENCY"] = "fixed:5"
+    os.environ["LLM_STUB_ERROR_RATE"] = "0"
+    os.environ["TRIAGE_ENABLED"] = "true"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_in_process(workdir)
+        failures = asyncio.run(check_banners())
+    failures += check_one_liners()
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Triage templated generated files and accessors, and nothing risky.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Offline load test for /analyze, /chat and /feedback.
+
+By default the app runs in-process (httpx ASGITransport, lifespan
+included) with LLM_BACKEND=stub and throwaway databases, so no request
+leaves the machine and no Gemini quota is spent. The stub's latency and
+failure rate come from the LLM_STUB_* variables (see stub_llm.py). Pass
+--url to load a running server instead; start it with LLM_BACKEND=stub.
+
+Each endpoint is driven on its own by --concurrency workers until
+--requests responses are in, then throughput and p50/p95/p99 latency are
+reported.
+
+    python benchmarks/load_test.py --concurrency 32 --requests 400
+    LLM_STUB_LATENCY=lognormal:1500:0.6 LLM_STUB_ERROR_RATE=0.05 \\
+        python benchmarks/load_test.py --endpoint analyze
+    python benchmarks/load_test.py --url http://localhost:8000 --output load.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Callable
+from contextlib import AsyncExitStack
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FUNCTIONS_PER_FILE = 4
+HOT_EXPLANATIONS = 50
+REQUEST_TIMEOUT_S = 120
+
+
+def make_source(index: int) -> str:
+    """A small module whose code differs per request, so neither cache nor coalescing kicks in."""
+    functions = [
+        f"def handler_{index}_{n}(items, limit={index % 97 + n}):\n"
+        "    total = 0\n"
+        "    for item in items:\n"
+        "        if item > limit:\n"
+        "            total += item * 2\n"
+        "        elif item < 0:\n"
+        "            total -= item\n"
+        "    return total\n"
+        for n in range(FUNCTIONS_PER_FILE)
+    ]
+    return "\n\n".join(functions)
+
+
+def analyze_payload(index: int) -> dict:
+    return {"code": make_source(index), "language": "python", "use_cache": False}
+
+
+def chat_payload(index: int) -> dict:
+    return {
+        "message": f"Why does handler_{index}_0 loop over every item?",
+        "code_context": make_source(index),
+        "language": "python",
+        "history": [],
+    }
+
+
+def feedback_payload(index: int) -> dict:
+    target = index % HOT_EXPLANATIONS
+    return {
+        "function_name": f"handler_{target}",
+        "code": f"def handler_{target}(): pass",
+        "explanation": f"explanation {target}",
+        "rating": -1 if index % 3 == 0 else 1,
+        "language": "python",
+    }
+
+
+def analyze_failure(body: dict) -> str | None:
+    # /analyze answers 200 even when single functions fail (e.g. injected LLM errors)
+    if any("error" in report for report in body.get("results", [])):
+        return "function error"
+    return None
+
+
+ENDPOINTS: dict[str, tuple[str, Callable[[int], dict], Callable[[dict], str | None] | None]] = {
+    "analyze": ("/analyze", analyze_payload, analyze_failure),
+    "chat": ("/chat", chat_payload, None),
+    "feedback": ("/feedback", feedback_payload, None),
+}
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def drive(client: httpx.AsyncClient, name: str, total: int, concurrency: int) -> dict:
+    path, make_payload, failure = ENDPOINTS[name]
+    latencies: list[float] = []
+    errors: Counter[str] = Counter()
+    indices = itertools.count()
+
+    async def worker():
+        while (index := next(indices)) < total:
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=make_payload(index))
+                problem = None if response.status_code == 200 else f"HTTP {response.status_code}"  # noqa: PLR2004
+                if problem is None and failure is not None:
+                    problem = failure(response.json())
+            except httpx.HTTPError as e:
+                problem = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            if problem:
+                errors[problem] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": path,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": dict(errors),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+    }
+
+
+def configure_in_process(workdir: str):
+    """Offline settings for the in-process app; must run before backend is imported."""
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["TRAINING_DB"] = str(Path(workdir) / "training_data.db")
+    os.environ["ANALYSIS_CACHE_DB"] = str(Path(workdir) / "analysis_cache.db")
+    # Measure the service, not the Gemini quota: export these to test throttling
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+
+
+async def run(args) -> list[dict]:
+    async with AsyncExitStack() as stack:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=REQUEST_TIMEOUT_S)
+        else:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+            configure_in_process(workdir)
+            from backend import app  # noqa: PLC0415
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app),
+                base_url="http://load-test",
+                timeout=REQUEST_TIMEOUT_S,
+            )
+        await stack.enter_async_context(client)
+
+        results = []
+        for name in args.endpoint or list(ENDPOINTS):
+            print(f"🚀 {name}: {args.requests} requests, {args.concurrency} concurrent...")
+            results.append(await drive(client, name, args.requests, args.concurrency))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test with the stub LLM.")
+    parser.add_argument("--url", help="Load a running server instead of the in-process app")
+    parser.add_argument("--endpoint", action="append", choices=list(ENDPOINTS))
+    parser.add_argument("--concurrency", "-c", type=int, default=16)
+    parser.add_argument("--requests", "-n", type=int, default=200)
+    parser.add_argument("--output", "-o", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(
+        f"\n{'endpoint':<10} {'reqs':>6} {'errors':>7} {'req/s':>8} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+    )
+    for result in results:
+        print(
+            f"{result['endpoint']:<10} {result['requests']:>6} "
+            f"{sum(result['errors'].values()):>7} {result['throughput_rps']:>8.1f} "
+            f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+            f"{result['p99_ms']:>9.1f} {result['max_ms']:>9.1f}",
+        )
+        if result["errors"]:
+            print(f"{'':<10} errors: {result['errors']}")
+
+    if args.output:
+        config = {key: value for key, value in os.environ.items() if key.startswith("LLM_")}
+        Path(args.output).write_text(
+            json.dumps({"config": config, "results": results}, indent=2) + "\n",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,78 @@
-import os
+from collections.abc import AsyncIterator
+from contextlib import aclosing
 
-from dotenv import load_dotenv
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-load_dotenv()
+from chat_context import select_context
+from cpu_executor import run_cpu
+from llm_registry import CHAT_MODEL, get_llm
+from llm_scheduler import Priority, estimate_tokens, llm_scheduler
+from metrics import observe_output_tokens, track_llm_call
+
+# System Prompt (Context Injection)
+# Language and code are template variables so the template is built only once
+# (and braces inside user code can never be mistaken for placeholders).
+SYSTEM_PROMPT = (
+    "You are a Senior {language} Expert. "
+    "The user is asking about the code block below.\n"
+    "GUIDELINES:\n"
+    "1. Be extremely concise. No fluff. No 'That's a great question'.\n"
+    "2. If the user asks for a fix, provide JUST the code snippet and a 1-sentence explanation.\n"
+    "3. Use Markdown formatting (``` code blocks) for all code.\n"
+    "4. Assume the user is a developer; do not over-explain basic concepts.\n\n"
+    "### CONTEXT CODE ###\n{code_context}"
+    "{summary}"
+)
+
+CHAT_OUTPUT_TOKEN_ESTIMATE = 512
+
+# Upper bound asked of the model when folding old turns into a session summary
+SUMMARY_MAX_WORDS = 150
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You maintain the running summary of a conversation between a developer "
+            "and a code assistant. Merge the new messages into the summary in at most "
+            f"{SUMMARY_MAX_WORDS} words. Keep decisions, fixes already given, open "
+            "questions and names of functions discussed; drop pleasantries.",
+        ),
+        ("human", "CURRENT SUMMARY:\n{summary}\n\nNEW MESSAGES:\n{messages}"),
+    ]
+)
+
+CHAT_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="history"),
+        ("human", "{input}"),
+    ]
+)
 
 
 class CodeSenseiChat:
     def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found")
-
         # Use Flash for Chat (Faster, lower latency)
         # Or stick to Pro if you want deep reasoning
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=0.4,  # Slightly creative for conversation
-            google_api_key=api_key,
+        self.llm = get_llm(
+            CHAT_MODEL,
+            0.4,  # Slightly creative for conversation
         )
+        self.chain = CHAT_PROMPT | self.llm
+        self.summary_chain = SUMMARY_PROMPT | self.llm
 
-    def chat(self, user_message: str, code_context: str, language: str, history: list):
-        """
-        Conversational turn.
-        """
-        # 1. Convert Pydantic history to LangChain format
+    def _prepare(
+        self,
+        user_message: str,
+        code_context: str,
+        language: str,
+        history: list,
+        summary: str,
+    ) -> tuple[dict, int]:
+        """Chain inputs plus the token estimate to reserve in the scheduler."""
+        # Convert Pydantic history to LangChain format
         lc_history = []
         for msg in history:
             if msg.role == "user":
@@ -34,29 +80,118 @@ class CodeSenseiChat:
             else:
                 lc_history.append(AIMessage(content=msg.content))
 
-        # 2. System Prompt (Context Injection)
-        system_prompt = (
-            f"You are a Senior {language} Expert. "
-            "The user is asking about the code block below.\n"
-            "GUIDELINES:\n"
-            "1. Be extremely concise. No fluff. No 'That's a great question'.\n"
-            "2. If the user asks for a fix, provide JUST the code snippet and a 1-sentence explanation.\n"
-            "3. Use Markdown formatting (``` code blocks) for all code.\n"
-            "4. Assume the user is a developer; do not over-explain basic concepts.\n\n"
-            f"### CONTEXT CODE ###\n{code_context}"
+        # Large files: only the parts relevant to this question go in the prompt
+        code_context, context_meta = select_context(
+            code_context,
+            language,
+            user_message,
+            history,
         )
+        if context_meta["mode"] == "selected":
+            print(
+                f"🎯 Chat context: {context_meta['functions_included']}/"
+                f"{context_meta['functions_total']} functions, ~{context_meta['tokens']} "
+                f"of {context_meta['full_tokens']} tokens",
+            )
 
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", system_prompt),
-                MessagesPlaceholder(variable_name="history"),
-                ("human", "{input}"),
-            ]
+        if summary:
+            summary = f"\n\n### EARLIER IN THIS CONVERSATION (summary) ###\n{summary}"
+
+        prompt_tokens = estimate_tokens(
+            code_context + summary + user_message + "".join(msg.content for msg in history)
         )
+        inputs = {
+            "language": language,
+            "code_context": code_context,
+            "summary": summary,
+            "history": lc_history,
+            "input": user_message,
+        }
+        return inputs, prompt_tokens + CHAT_OUTPUT_TOKEN_ESTIMATE
+
+    async def chat(
+        self,
+        user_message: str,
+        code_context: str,
+        language: str,
+        history: list,
+        summary: str = "",
+    ):
+        """
+        Conversational turn.
 
-        chain = prompt | self.llm
+        ``summary`` carries older turns of a server-side session that no
+        longer fit in ``history``.
+        """
+        # Context selection parses the code: keep it off the event loop
+        inputs, estimated_tokens = await run_cpu(
+            self._prepare,
+            user_message,
+            code_context,
+            language,
+            history,
+            summary,
+        )
 
-        # 3. Invoke
-        response = chain.invoke({"history": lc_history, "input": user_message})
+        # Interactive priority: chat jumps ahead of queued analyses
+        with track_llm_call("chat", CHAT_MODEL, estimated_tokens - CHAT_OUTPUT_TOKEN_ESTIMATE):
+            response = await llm_scheduler.acall(
+                lambda: self.chain.ainvoke(inputs),
+                priority=Priority.INTERACTIVE,
+                estimated_tokens=estimated_tokens,
+            )
+        observe_output_tokens("chat", estimate_tokens(response.text))
 
         return response.content
+
+    async def stream(
+        self,
+        user_message: str,
+        code_context: str,
+        language: str,
+        history: list,
+        summary: str = "",
+    ) -> AsyncIterator[str]:
+        """
+        Streaming conversational turn.
+
+        Waits for the scheduler to admit the call (raising
+        SchedulerQueueFullError like chat does), then returns an iterator of
+        text chunks. Closing the iterator early closes the upstream stream.
+        """
+        inputs, estimated_tokens = await run_cpu(
+            self._prepare,
+            user_message,
+            code_context,
+            language,
+            history,
+            summary,
+        )
+        await llm_scheduler.aadmit(Priority.INTERACTIVE, estimated_tokens)
+        return self._text_chunks(inputs, estimated_tokens - CHAT_OUTPUT_TOKEN_ESTIMATE)
+
+    async def _text_chunks(self, inputs: dict, prompt_tokens: int) -> AsyncIterator[str]:
+        streamed: list[str] = []
+        # aclosing: leaving early must close the HTTP stream to Gemini, not leak it
+        with track_llm_call("chat_stream", CHAT_MODEL, prompt_tokens):
+            async with aclosing(self.chain.astream(inputs)) as upstream:
+                async for chunk in upstream:
+                    if chunk.text:
+                        streamed.append(chunk.text)
+                        yield chunk.text
+        observe_output_tokens("chat_stream", estimate_tokens("".join(streamed)))
+
+    async def summarize(self, summary: str, messages: list) -> str:
+        """Folds messages that left a session's window into its rolling summary."""
+        transcript = "\n".join(f"{msg.role}: {msg.content}" for msg in messages)
+        prompt_tokens = estimate_tokens(summary + transcript)
+        with track_llm_call("chat_summary", CHAT_MODEL, prompt_tokens):
+            response = await llm_scheduler.acall(
+                lambda: self.summary_chain.ainvoke(
+                    {"summary": summary or "(empty)", "messages": transcript},
+                ),
+                priority=Priority.STANDARD,
+                estimated_tokens=prompt_tokens + SUMMARY_MAX_WORDS * 2,
+            )
+        observe_output_tokens("chat_summary", estimate_tokens(response.text))
+        return response.text.strip()
@@ -0,0 +1,155 @@
+import os
+import re
+from functools import lru_cache
+
+from llm_scheduler import estimate_tokens
+from parser_engine import get_parser, split_context
+
+# Estimated tokens of code_context sent with a chat turn; smaller inputs go in whole
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1500"))
+
+# How many of the latest history messages also count towards relevance
+HISTORY_MESSAGES = 4
+
+NAME_WEIGHT = 4.0
+BODY_WEIGHT = 1.0
+HISTORY_WEIGHT = 0.5
+LINE_MENTION_SCORE = 10.0
+
+WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+LINE_MENTION = re.compile(r"\blines?\s+(\d+)", re.IGNORECASE)
+
+STOPWORDS = set(
+    "the and for this that with what why how does can you are not but from into there "
+    "here its should would could code function method please explain make".split(),
+)
+
+
+def _terms(text: str) -> set[str]:
+    """Lowercase identifier parts: getUserName / get_user_name -> get, user, name."""
+    terms = set()
+    for word in WORD_PATTERN.findall(text):
+        lowered = word.lower()
+        terms.add(lowered)
+        for part in CAMEL_BOUNDARY.sub("_", word).lower().split("_"):
+            terms.add(part)
+    return {term for term in terms if len(term) > 2 and term not in STOPWORDS}  # noqa: PLR2004
+
+
+@lru_cache(maxsize=32)
+def _outline(code_context: str, language: str) -> tuple[list[dict], list[dict]]:
+    """Functions and top-level symbols of a context, memoized across turns of a conversation."""
+    parser = get_parser()
+    tree = parser.parse(code_context, language)
+    functions = []
+    for func in parser.extract_functions(code_context, language, tree=tree):
+        skeletons, source = split_context(func["code"])
+        functions.append(
+            {
+                "name": func["name"],
+                "start_line": func["start_line"],
+                "end_line": func["end_line"],
+                "source": source,
+                "skeletons": skeletons,
+                "name_terms": _terms(func["name"]),
+                "terms": _terms(source),
+            },
+        )
+    symbols = [
+        {
+            **symbol,
+            "end_line": symbol["start_line"],
+            "name_terms": _terms(symbol["name"]),
+            "terms": set(),
+        }
+        for symbol in parser.extract_top_level_symbols(code_context, language, tree=tree)
+    ]
+    return functions, symbols
+
+
+def _score(item: dict, question: set[str], history: set[str], lines: set[int]) -> float:
+    score = NAME_WEIGHT * len(item["name_terms"] & question)
+    score += BODY_WEIGHT * len(item["terms"] & question)
+    score += HISTORY_WEIGHT * len((item["name_terms"] | item["terms"]) & history)
+    if any(item["start_line"] <= line <= item["end_line"] for line in lines):
+        score += LINE_MENTION_SCORE
+    return score
+
+
+def select_context(
+    code_context: str,
+    language: str,
+    question: str,
+    history: list,
+) -> tuple[str, dict]:
+    """
+    Picks the parts of code_context most relevant to a chat turn.
+
+    Functions (with their dependency skeletons) and top-level symbols are
+    ranked by identifier/keyword overlap with the question and recent
+    history. Only matching ones are packed, best first, within
+    CHAT_CONTEXT_TOKEN_BUDGET, then re-emitted in source order. Small or
+    unparsable inputs are returned whole.
+    """
+    total_tokens = estimate_tokens(code_context)
+    if total_tokens <= CHAT_CONTEXT_TOKEN_BUDGET:
+        return code_context, {"mode": "full", "tokens": total_tokens}
+
+    try:
+        functions, symbols = _outline(code_context, language)
+    except Exception as e:  # noqa: BLE001
+        print(f"⚠️ Chat context selection failed, sending full context: {e}")
+        return code_context, {"mode": "full", "tokens": total_tokens}
+    if not functions:
+        return code_context, {"mode": "full", "tokens": total_tokens}
+
+    question_terms = _terms(question)
+    history_terms = _terms(" ".join(msg.content for msg in history[-HISTORY_MESSAGES:]))
+    lines = {int(line) for line in LINE_MENTION.findall(question)}
+
+    candidates = [
+        (_score(item, question_terms, history_terms, lines), item["start_line"], item)
+        for item in [*functions, *symbols]
+    ]
+    if any(score > 0 for score, _, _ in candidates):
+        candidates = [candidate for candidate in candidates if candidate[0] > 0]
+    # Best score first, then source order (so "nothing matched" sends the top of the file)
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+
+    selected: list[tuple[int, str]] = []
+    seen_skeletons: set[str] = set()
+    tokens = 0
+    included_functions = 0
+    for _, start_line, item in candidates:
+        if "source" in item:
+            new_skeletons = [s for s in item["skeletons"] if s not in seen_skeletons]
+            text = "\n".join([*new_skeletons, item["source"]])
+        else:
+            if item["skeleton"] in seen_skeletons:
+                continue
+            new_skeletons = [item["skeleton"]]
+            text = item["skeleton"]
+
+        cost = estimate_tokens(text)
+        if tokens + cost > CHAT_CONTEXT_TOKEN_BUDGET:
+            continue
+        tokens += cost
+        seen_skeletons.update(new_skeletons)
+        selected.append((start_line, text))
+        included_functions += "source" in item
+
+    selected.sort(key=lambda part: part[0])
+    omitted = len(functions) - included_functions
+    note = (
+        f"(Excerpt: {included_functions} of {len(functions)} functions most relevant to "
+        f"the question; {omitted} omitted. Ask for others by name.)"
+    )
+    meta = {
+        "mode": "selected",
+        "tokens": tokens,
+        "full_tokens": total_tokens,
+        "functions_included": included_functions,
+        "functions_total": len(functions),
+    }
+    return note + "\n\n" + "\n\n".join(text for _, text in selected), meta
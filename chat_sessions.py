@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+from llm_scheduler import estimate_tokens
+from schemas import ChatMessage
+from session_store import SessionStore
+
+CHAT_SESSION_IDLE_SECONDS = int(os.getenv("CHAT_SESSION_IDLE_SECONDS", "1800"))
+CHAT_SESSION_MAX_COUNT = int(os.getenv("CHAT_SESSION_MAX", "500"))
+CHAT_SESSION_MAX_BYTES = int(os.getenv("CHAT_SESSION_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Recent turns sent verbatim; anything older is folded into the summary
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+
+# The latest exchange always stays verbatim, however long it is
+MIN_WINDOW_MESSAGES = 2
+
+
+class ChatSession:
+    """Code context, recent messages and rolling summary of one conversation."""
+
+    def __init__(self, code_context: str, language: str):
+        self.code_context = code_context
+        self.language = language
+        # Serializes turns (and summary compaction) within the session
+        self.lock = asyncio.Lock()
+        self.messages: list[ChatMessage] = []
+        self.summary = ""
+        self.summarized_messages = 0
+
+    def add_turn(self, user_message: str, reply: str):
+        self.messages.append(ChatMessage(role="user", content=user_message))
+        self.messages.append(ChatMessage(role="assistant", content=reply))
+
+    def window_tokens(self) -> int:
+        return sum(estimate_tokens(msg.content) for msg in self.messages)
+
+    def take_overflow(self) -> list[ChatMessage]:
+        """
+        Removes the oldest messages until the window fits the token budget.
+
+        Whole user/assistant pairs are removed so the window never starts
+        with a dangling reply. The caller folds them into the summary.
+        """
+        overflow: list[ChatMessage] = []
+        while (
+            len(self.messages) > MIN_WINDOW_MESSAGES
+            and self.window_tokens() > CHAT_HISTORY_TOKEN_BUDGET
+        ):
+            overflow.extend(self.messages[:2])
+            del self.messages[:2]
+        return overflow
+
+    def size_bytes(self) -> int:
+        return (
+            len(self.code_context)
+            + len(self.summary)
+            + sum(len(msg.content) for msg in self.messages)
+        )
+
+
+chat_sessions = SessionStore(
+    idle_timeout_seconds=CHAT_SESSION_IDLE_SECONDS,
+    max_sessions=CHAT_SESSION_MAX_COUNT,
+    max_bytes=CHAT_SESSION_MAX_BYTES,
+    size_of=lambda session: session.size_bytes(),
+)
@@ -0,0 +1,21 @@
+import asyncio
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# Parsing, linting and triage run here instead of on the event loop. The
+# bound keeps a burst of large files from occupying more threads than there
+# are cores (and from starving asyncio.to_thread's default pool).
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+
+async def run_cpu(fn: Callable[..., T], /, *args, **kwargs) -> T:
+    """Runs ``fn(*args, **kwargs)`` on the bounded CPU executor and awaits the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, partial(fn, *args, **kwargs))
@@ -1,21 +1,99 @@
-from sqlite3 import DatabaseError, connect
+import hashlib
+import os
+import queue
+import re
+import threading
+from contextlib import contextmanager
+from sqlite3 import Connection, DatabaseError, connect
 
-DB_NAME = "training_data.db"
+DB_NAME = os.getenv("TRAINING_DB", "training_data.db")
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+# Wait this long on a locked database instead of failing immediately
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
 
-def get_db():
-    conn = connect(DB_NAME, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        yield conn
-    finally:
-        conn.close()
 
+def normalized_code_hash(code: str) -> str:
+    """SHA-256 of the code with all whitespace stripped (formatting-insensitive)."""
+    normalized_code = re.sub(r"\s+", "", code)
+    return hashlib.sha256(normalized_code.encode("utf-8")).hexdigest()
+
+
+def open_connection(path: str = DB_NAME) -> Connection:
+    conn = connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS};")
+    # WAL makes NORMAL durable across application crashes (not power loss)
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Reuses SQLite connections instead of opening one (and re-running the
+    PRAGMAs) per request. Connections are created lazily up to ``size``;
+    extra borrowers wait for one to be returned.
+    """
+
+    def __init__(self, path: str = DB_NAME, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle: queue.LifoQueue[Connection] = queue.LifoQueue()
+        self._created = 0
+        self._created_lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = self._take()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def _take(self) -> Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._created_lock:
+            if self._created < self.size:
+                self._created += 1
+                return open_connection(self.path)
+        return self._idle.get()
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._created_lock:
+                self._created -= 1
 
-def create_table():
+
+db_pool = ConnectionPool()
+
+
+def _migrate_feedback_loops(cursor):
+    """Adds columns and indexes introduced after the table was first created."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(feedback_loops)")}
+    if "language" not in columns:
+        cursor.execute("ALTER TABLE feedback_loops ADD COLUMN language TEXT")
+    # Exports page through (last_updated, id) ranges instead of scanning the table
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_feedback_last_updated "
+        "ON feedback_loops (last_updated, id)",
+    )
+
+
+def create_table(path: str = DB_NAME):
     """Run this once on startup."""
     try:
-        with connect(DB_NAME) as conn:
+        with connect(path) as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS feedback_loops (
@@ -30,6 +108,19 @@ def create_table():
                     UNIQUE(code_hash, ai_explanation)
                 )
             """)
+            _migrate_feedback_loops(cursor)
+            # Highest-scoring explanation per code_hash, kept current by the feedback writer
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS best_explanations (
+                    code_hash TEXT PRIMARY KEY,
+                    feedback_id INTEGER,
+                    ai_explanation TEXT,
+                    upvotes INTEGER,
+                    downvotes INTEGER,
+                    score REAL,
+                    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
             conn.commit()
             print("✅ Database initialized successfully.")
     except DatabaseError as e:
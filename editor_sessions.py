@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import json
+import os
+
+from parser_engine import get_parser
+from schemas import CodeEdit
+from session_store import SessionStore
+
+SESSION_IDLE_SECONDS = int(os.getenv("EDITOR_SESSION_IDLE_SECONDS", "900"))
+SESSION_MAX_COUNT = int(os.getenv("EDITOR_SESSION_MAX", "200"))
+SESSION_MAX_BYTES = int(os.getenv("EDITOR_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Rough in-memory cost of a tree-sitter tree per byte of source
+TREE_BYTES_PER_SOURCE_BYTE = 10
+
+
+def _point_at(data: bytes, offset: int) -> tuple[int, int]:
+    """(row, byte column) of a byte offset, as tree-sitter expects."""
+    row = data.count(b"\n", 0, offset)
+    line_start = data.rfind(b"\n", 0, offset) + 1
+    return row, offset - line_start
+
+
+def function_fingerprint(func: dict) -> str:
+    """Identifies a function's analyzable content across edits."""
+    raw = f"{func['name']}\n{func.get('body_only', func['code'])}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EditorSession:
+    """Last known source, tree and per-function reports of one open editor file."""
+
+    def __init__(self, code: str, language: str):
+        self.language = language
+        # Serializes edits to the same session
+        self.lock = asyncio.Lock()
+        self.data = code.encode("utf8")
+        self.tree = get_parser().parse(code, language)
+        # function fingerprint -> analysis report of its last successful run
+        self.reports: dict[str, dict] = {}
+
+    @property
+    def code(self) -> str:
+        return self.data.decode("utf8")
+
+    def apply_edits(self, edits: list[CodeEdit]):
+        """
+        Applies byte-range edits in order and re-parses incrementally.
+
+        Offsets of each edit refer to the text produced by the previous one.
+        Raises ValueError for out-of-range offsets or broken UTF-8.
+        """
+        data = self.data
+        # Edit a copy so a rejected batch leaves the session untouched
+        tree = self.tree.copy()
+        for edit in edits:
+            if not 0 <= edit.start_byte <= edit.old_end_byte <= len(data):
+                msg = (
+                    f"Edit range {edit.start_byte}..{edit.old_end_byte} is outside "
+                    f"the {len(data)}-byte document"
+                )
+                raise ValueError(msg)
+
+            new_bytes = edit.new_text.encode("utf8")
+            new_end_byte = edit.start_byte + len(new_bytes)
+            start_point = _point_at(data, edit.start_byte)
+            old_end_point = _point_at(data, edit.old_end_byte)
+
+            data = data[: edit.start_byte] + new_bytes + data[edit.old_end_byte :]
+            tree.edit(
+                start_byte=edit.start_byte,
+                old_end_byte=edit.old_end_byte,
+                new_end_byte=new_end_byte,
+                start_point=start_point,
+                old_end_point=old_end_point,
+                new_end_point=_point_at(data, new_end_byte),
+            )
+
+        try:
+            code = data.decode("utf8")
+        except UnicodeDecodeError as e:
+            msg = f"Edits produced invalid UTF-8: {e}"
+            raise ValueError(msg) from e
+
+        self.data = data
+        self.tree = get_parser().parse(code, self.language, old_tree=tree)
+
+    def size_bytes(self) -> int:
+        reports_size = sum(len(json.dumps(report)) for report in self.reports.values())
+        return len(self.data) * (1 + TREE_BYTES_PER_SOURCE_BYTE) + reports_size
+
+
+editor_sessions = SessionStore(
+    idle_timeout_seconds=SESSION_IDLE_SECONDS,
+    max_sessions=SESSION_MAX_COUNT,
+    max_bytes=SESSION_MAX_BYTES,
+    size_of=lambda session: session.size_bytes(),
+)
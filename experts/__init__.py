@@ -1,3 +1,6 @@
+import importlib
+
+from experts.base_expert import get_expert_chain
 from experts.cpp_expert import cpp_expert
 from experts.csharp_expert import csharp_expert
 from experts.generic_expert import generic_expert
@@ -5,11 +8,37 @@ from experts.java_expert import java_expert
 from experts.js_expert import js_expert
 from experts.python_expert import python_expert
 
+EXPERT_NAMES = (
+    "cpp_expert",
+    "csharp_expert",
+    "generic_expert",
+    "java_expert",
+    "js_expert",
+    "python_expert",
+)
+
+
+def expert_module(name: str):
+    """The experts.<name> module (LANG_LABEL, INSTRUCTIONS) for an expert node name."""
+    # The package attribute is shadowed by the node function, so go via importlib
+    return importlib.import_module(f"experts.{name}")
+
+
+def warm_up_experts():
+    """Builds every persona chain (and the shared LLM client) before the first request."""
+    for name in EXPERT_NAMES:
+        module = expert_module(name)
+        get_expert_chain(module.LANG_LABEL, module.INSTRUCTIONS)
+
+
 __all__ = [
+    "EXPERT_NAMES",
     "cpp_expert",
     "csharp_expert",
+    "expert_module",
     "generic_expert",
     "java_expert",
     "js_expert",
     "python_expert",
+    "warm_up_experts",
 ]
@@ -1,46 +1,25 @@
 # ruff: noqa: PGH003
-import os
+from functools import lru_cache
 
-from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-from schemas import CodeSenseiAnalysis
+from llm_registry import EXPERT_MODEL, get_structured_llm
+from llm_scheduler import Priority, estimate_tokens, llm_scheduler
+from metrics import observe_output_tokens, track_llm_call
+from schemas import BatchAnalysis, CodeSenseiAnalysis
 from shared_state import AgentState
 
-load_dotenv()
+# Bump whenever a persona or the prompt below changes: it is part of the
+# analysis cache key, so stale answers are never served for new prompts.
+PROMPT_VERSION = "v1"
 
+# Output tokens reserved in the rate limiter for one structured analysis
+OUTPUT_TOKEN_ESTIMATE = 1024
 
-def analyze_with_persona(
-    state: AgentState,
-    lang_label: str,
-    specific_instructions: str,
-):
-    """Shared logic to call Gemini with a specific persona."""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        return {"error": "GOOGLE_API_KEY not found."}
-
-    # Initialize Gemini
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        temperature=0,
-        google_api_key=api_key,
-    )
 
-    # Bind Schema
-    structured_llm = llm.with_structured_output(CodeSenseiAnalysis)
-
-    linter_section = ""
-
-    # Check if linter_errors exists AND is not empty
-    if state.get("linter_errors") and len(state["linter_errors"]) > 0:  # type: ignore
-        errors_str = "\n".join(state["linter_errors"])  # type: ignore
-        linter_section = f"\n\n### STATIC ANALYSIS REPORT (Verified Bugs) ###\n{errors_str}\n\nINSTRUCTION: The code above has verified compilation/linting errors. Explain these errors to the user first, then analyze the logic."
-
-    # 2. Define Prompt with a Placeholder
+def _persona_prompt(lang_label: str, specific_instructions: str) -> str:
     # We use {linter_context} so LangChain handles the injection safely
-    system_prompt = (
+    return (
         f"You are a Senior {lang_label} Engineer and Code Sensei. "
         "Explain code to junior devs and catch 'Knowledge Debt'.\n"
         f"SPECIFIC FOCUS: {specific_instructions}\n"
@@ -51,25 +30,140 @@ def analyze_with_persona(
         "{linter_context}"
     )
 
+
+def _linter_section(linter_errors: list[str] | None) -> str:
+    if not linter_errors:
+        return ""
+    errors_str = "\n".join(linter_errors)
+    return f"\n\n### STATIC ANALYSIS REPORT (Verified Bugs) ###\n{errors_str}\n\nINSTRUCTION: The code above has verified compilation/linting errors. Explain these errors to the user first, then analyze the logic."
+
+
+@lru_cache(maxsize=None)
+def get_expert_chain(
+    lang_label: str,
+    specific_instructions: str,
+    model: str = EXPERT_MODEL,
+    temperature: float = 0,
+):
+    """Prompt + structured Gemini chain for one persona, built once per process."""
+    # Bind Schema
+    structured_llm = get_structured_llm(CodeSenseiAnalysis, model, temperature)
+
     prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", system_prompt),
+            ("system", _persona_prompt(lang_label, specific_instructions)),
             ("human", "Analyze this {lang} function named '{name}':\n\n{code}"),
         ],
     )
 
-    chain = prompt | structured_llm
+    return prompt | structured_llm
+
 
+@lru_cache(maxsize=None)
+def get_batch_chain(
+    lang_label: str,
+    specific_instructions: str,
+    model: str = EXPERT_MODEL,
+    temperature: float = 0,
+):
+    """Same persona, but analyzing several small functions in one structured call."""
+    structured_llm = get_structured_llm(BatchAnalysis, model, temperature)
+
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", _persona_prompt(lang_label, specific_instructions)),
+            (
+                "human",
+                "Analyze each of these {lang} functions separately. Return exactly one "
+                "entry per function and copy its name from the '### FUNCTION' header.\n\n"
+                "{functions}",
+            ),
+        ],
+    )
+
+    return prompt | structured_llm
+
+
+async def analyze_with_persona(
+    state: AgentState,
+    lang_label: str,
+    specific_instructions: str,
+):
+    """Shared logic to call Gemini with a specific persona."""
+    model = state.get("expert_model") or EXPERT_MODEL
     try:
-        result = chain.invoke(
-            {
-                "lang": lang_label,
-                "name": state["function_name"],
-                "code": state["code"],
-                "linter_context": linter_section,
-            },
-        )
+        chain = get_expert_chain(lang_label, specific_instructions, model=model)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    linter_section = _linter_section(state.get("linter_errors"))
+
+    prompt_tokens = estimate_tokens(specific_instructions + state["code"] + linter_section)
+
+    try:
+        with track_llm_call(lang_label, model, prompt_tokens):
+            result = await llm_scheduler.acall(
+                lambda: chain.ainvoke(
+                    {
+                        "lang": lang_label,
+                        "name": state["function_name"],
+                        "code": state["code"],
+                        "linter_context": linter_section,
+                    },
+                ),
+                priority=Priority(state.get("priority", Priority.STANDARD)),
+                estimated_tokens=prompt_tokens + OUTPUT_TOKEN_ESTIMATE,
+            )
+        observe_output_tokens(lang_label, estimate_tokens(result.model_dump_json()))  # type: ignore
         # Return the Pydantic model dumped as a dict
         return {"analysis": result.model_dump()}  # type: ignore
     except Exception as e:  # noqa: BLE001
         return {"error": f"LLM Generation Failed: {e!s}"}
+
+
+async def analyze_batch_with_persona(
+    functions: dict[str, tuple[str, list[str] | None]],
+    lang_label: str,
+    specific_instructions: str,
+    priority: Priority = Priority.STANDARD,
+    model: str = EXPERT_MODEL,
+) -> dict[str, dict]:
+    """
+    Analyzes several functions (label -> (code, linter errors)) in one call.
+
+    Returns label -> analysis for every function the model answered for;
+    labels it skipped or mangled are simply missing. Raises if the call
+    itself fails or the output does not validate.
+    """
+    chain = get_batch_chain(lang_label, specific_instructions, model=model)
+
+    blocks = [
+        f"### FUNCTION: {label} ###\n{code}{_linter_section(linter_errors)}"
+        for label, (code, linter_errors) in functions.items()
+    ]
+    functions_text = "\n\n".join(blocks)
+    prompt_tokens = estimate_tokens(specific_instructions + functions_text)
+    caller = f"{lang_label} batch"
+
+    with track_llm_call(caller, model, prompt_tokens):
+        result = await llm_scheduler.acall(
+            lambda: chain.ainvoke(
+                {
+                    "lang": lang_label,
+                    "functions": functions_text,
+                    "linter_context": "",
+                },
+            ),
+            priority=priority,
+            estimated_tokens=prompt_tokens + OUTPUT_TOKEN_ESTIMATE * len(functions),
+        )
+    if result is None:
+        msg = "Batched analysis did not match the BatchAnalysis schema."
+        raise ValueError(msg)
+    observe_output_tokens(caller, estimate_tokens(result.model_dump_json()))  # type: ignore
+
+    analyses = {}
+    for entry in result.analyses:  # type: ignore
+        if entry.function_name in functions and entry.function_name not in analyses:
+            analyses[entry.function_name] = entry.analysis.model_dump()
+    return analyses
@@ -1,11 +1,14 @@
 from experts.base_expert import analyze_with_persona
 from shared_state import AgentState
 
+LANG_LABEL = "General Code"
 
-def generic_expert(state: AgentState):
-    instructions = (
-        "Focus on fundamental logical correctness, algorithmic complexity (Big O), "
-        "and clean code principles (SOLID, DRY). "
-        "Assume a general syntax but prioritize logic flaws."
-    )
-    return analyze_with_persona(state, "General Code", instructions)
+INSTRUCTIONS = (
+    "Focus on fundamental logical correctness, algorithmic complexity (Big O), "
+    "and clean code principles (SOLID, DRY). "
+    "Assume a general syntax but prioritize logic flaws."
+)
+
+
+async def generic_expert(state: AgentState):
+    return await analyze_with_persona(state, LANG_LABEL, INSTRUCTIONS)
@@ -0,0 +1,168 @@
+"""
+Streaming export of feedback_loops for fine-tuning pipelines.
+
+Rows are read in keyset-paginated chunks over the (last_updated, id)
+index and written as NDJSON (optionally gzip-compressed), so memory stays
+constant however large the table grows. Pass the printed watermark back
+as --since for the next incremental export.
+
+    python export_feedback.py --output feedback.ndjson.gz --gzip --min-net-votes 3
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import zlib
+from collections.abc import Iterator
+from datetime import UTC, datetime
+
+from database import DB_NAME, open_connection
+
+EXPORT_CHUNK_SIZE = 1000
+
+# What CURRENT_TIMESTAMP stores in last_updated (UTC)
+SQLITE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+EXPORT_COLUMNS = (
+    "id",
+    "code_hash",
+    "function_name",
+    "language",
+    "code_snippet",
+    "ai_explanation",
+    "upvotes",
+    "downvotes",
+    "last_updated",
+)
+
+
+def normalize_since(value: str) -> str:
+    """
+    Parses an ISO 8601 watermark into last_updated's own format.
+
+    The column is compared as text, so "2026-10-17T00:00:00" would sort
+    after every "2026-10-17 ..." row. Aware times are converted to UTC.
+    Raises ValueError for values that do not parse.
+    """
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(UTC).replace(tzinfo=None)
+    return parsed.strftime(SQLITE_TIMESTAMP_FORMAT)
+
+
+def iter_feedback_rows(
+    path: str = DB_NAME,
+    min_net_votes: int | None = None,
+    language: str | None = None,
+    since: str | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """
+    Yields matching rows in (last_updated, id) order, one chunk in memory at a time.
+
+    ``since`` must already be in last_updated's format (see normalize_since).
+    It is inclusive, so rows at the watermark itself come again in the
+    next incremental export; consumers should upsert by ``id``. A row voted
+    on during the export moves to the end of the range and may be yielded
+    again with its newer counts.
+    """
+    filters = ["(last_updated, id) > (?, ?)"]
+    extra_params: list = []
+    if min_net_votes is not None:
+        filters.append("upvotes - downvotes >= ?")
+        extra_params.append(min_net_votes)
+    if language:
+        filters.append("language = ?")
+        extra_params.append(language.lower())
+
+    query = (
+        f"SELECT {', '.join(EXPORT_COLUMNS)} FROM feedback_loops "  # noqa: S608
+        f"WHERE {' AND '.join(filters)} ORDER BY last_updated, id LIMIT ?"
+    )
+
+    # A dedicated connection: a long export must not hold a pooled one
+    conn = open_connection(path)
+    try:
+        cursor_key: tuple = (since or "", 0)
+        while True:
+            rows = conn.execute(query, (*cursor_key, *extra_params, chunk_size)).fetchall()
+            for row in rows:
+                record = dict(zip(EXPORT_COLUMNS, row, strict=True))
+                record["net_votes"] = record["upvotes"] - record["downvotes"]
+                yield record
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1]
+            cursor_key = (last[EXPORT_COLUMNS.index("last_updated")], last[0])
+    finally:
+        conn.close()
+
+
+def iter_ndjson(rows: Iterator[dict]) -> Iterator[bytes]:
+    for record in rows:
+        yield (json.dumps(record) + "\n").encode("utf8")
+
+
+def iter_gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Compresses a byte stream into one gzip member without buffering it whole."""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export feedback_loops as NDJSON.")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--output", "-o", default="-", help="File path, or - for stdout")
+    parser.add_argument("--gzip", action="store_true", help="gzip-compress the output")
+    parser.add_argument("--min-net-votes", type=int, default=None)
+    parser.add_argument("--language", default=None)
+    parser.add_argument(
+        "--since",
+        default=None,
+        help="Only rows updated at or after this timestamp (e.g. the last watermark)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.since:
+        try:
+            args.since = normalize_since(args.since)
+        except ValueError:
+            parser.error(f"--since: not an ISO 8601 timestamp: {args.since!r}")
+
+    if args.output == "-":
+        handle = sys.stdout.buffer
+        if args.gzip:
+            handle = gzip.GzipFile(fileobj=handle, mode="wb")
+    elif args.gzip:
+        handle = gzip.open(args.output, "wb")
+    else:
+        handle = open(args.output, "wb")  # noqa: SIM115
+
+    exported = 0
+    watermark = args.since
+    try:
+        for record in iter_feedback_rows(
+            args.db,
+            min_net_votes=args.min_net_votes,
+            language=args.language,
+            since=args.since,
+            chunk_size=args.chunk_size,
+        ):
+            handle.write((json.dumps(record) + "\n").encode("utf8"))
+            exported += 1
+            watermark = record["last_updated"]
+    finally:
+        if handle is not sys.stdout.buffer:
+            handle.close()
+
+    print(f"✅ Exported {exported} rows. Next --since: {watermark}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import os
+import queue
+import threading
+import time
+from typing import NamedTuple
+
+from answer_store import refresh_best_explanations
+from database import ConnectionPool, db_pool
+from metrics import DB_WRITE_SECONDS, FEEDBACK_BATCH_VOTES
+
+# A batch is committed when it reaches this size or this age, whichever is first
+FEEDBACK_BATCH_SIZE = int(os.getenv("FEEDBACK_BATCH_SIZE", "500"))
+FEEDBACK_FLUSH_INTERVAL_MS = int(os.getenv("FEEDBACK_FLUSH_INTERVAL_MS", "50"))
+# Votes waiting for the writer; beyond this /feedback answers 503
+FEEDBACK_QUEUE_MAX = int(os.getenv("FEEDBACK_QUEUE_MAX", "20000"))
+FEEDBACK_MAX_ATTEMPTS = 3
+
+UPSERT_VOTES = """
+    INSERT INTO feedback_loops
+    (code_hash, function_name, code_snippet, ai_explanation, language, upvotes, downvotes)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(code_hash, ai_explanation)
+    DO UPDATE SET
+        upvotes = upvotes + excluded.upvotes,
+        downvotes = downvotes + excluded.downvotes,
+        language = COALESCE(excluded.language, language),
+        last_updated = CURRENT_TIMESTAMP
+"""
+
+
+class Vote(NamedTuple):
+    code_hash: str
+    function_name: str
+    code_snippet: str
+    ai_explanation: str
+    upvote: bool
+    language: str | None = None
+
+
+class FeedbackQueueFullError(RuntimeError):
+    """Raised instead of queueing when the writer has fallen too far behind."""
+
+
+class FeedbackWriter:
+    """
+    Background group-commit writer for feedback votes.
+
+    Requests only enqueue their vote. A single thread drains the queue,
+    sums the votes per (code_hash, ai_explanation) and upserts each batch in
+    one transaction, so a vote storm costs one commit per batch instead of
+    one per request. The touched hashes' best explanations are refreshed in
+    the same transaction.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool = db_pool,
+        batch_size: int = FEEDBACK_BATCH_SIZE,
+        flush_interval_ms: int = FEEDBACK_FLUSH_INTERVAL_MS,
+        max_queue: int = FEEDBACK_QUEUE_MAX,
+    ):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: queue.Queue[Vote | None] = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        # Updated by request threads (submit) and the writer thread
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "accepted": 0,
+            "rejected": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "max_batch": 0,
+        }
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="feedback-writer",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def submit(self, vote: Vote):
+        """Queues a vote without touching the database (never blocks)."""
+        self.start()
+        try:
+            self._queue.put_nowait(vote)
+        except queue.Full as e:
+            self._count("rejected")
+            msg = "Feedback queue is full. Try again shortly."
+            raise FeedbackQueueFullError(msg) from e
+        self._count("accepted")
+
+    def _count(self, key: str, amount: int = 1):
+        with self._metrics_lock:
+            self._metrics[key] += amount
+
+    def stop(self, timeout: float = 10.0):
+        """Writes everything still queued, then stops the thread."""
+        with self._start_lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        # Blocking put: the sentinel must not be lost to a full queue
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    vote = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if vote is None:
+                    stopping = True
+                    break
+                batch.append(vote)
+
+            self._write(batch)
+            if stopping:
+                # Drain what arrived before the sentinel was queued
+                leftover = []
+                while not self._queue.empty():
+                    vote = self._queue.get_nowait()
+                    if vote is not None:
+                        leftover.append(vote)
+                if leftover:
+                    self._write(leftover)
+                return
+
+    def _write(self, batch: list[Vote]):
+        # (code_hash, ai_explanation) -> [function_name, code_snippet, language, upvotes, downvotes]
+        totals: dict[tuple[str, str], list] = {}
+        for vote in batch:
+            key = (vote.code_hash, vote.ai_explanation)
+            row = totals.setdefault(
+                key,
+                [vote.function_name, vote.code_snippet, vote.language, 0, 0],
+            )
+            row[2] = row[2] or vote.language
+            row[3 if vote.upvote else 4] += 1
+        rows = [
+            (code_hash, name, snippet, explanation, language, up, down)
+            for (code_hash, explanation), (name, snippet, language, up, down) in totals.items()
+        ]
+
+        for attempt in range(1, FEEDBACK_MAX_ATTEMPTS + 1):
+            try:
+                with (
+                    DB_WRITE_SECONDS.time(operation="feedback_batch"),
+                    self.pool.connection() as conn,
+                    conn,
+                ):
+                    conn.executemany(UPSERT_VOTES, rows)
+                    # Same transaction: readers never see votes without their effect
+                    refresh_best_explanations(conn, {row[0] for row in rows})
+            except Exception as e:  # noqa: BLE001
+                print(f"DB Error: feedback batch attempt {attempt} failed: {e}")
+                time.sleep(0.1 * attempt)
+            else:
+                with self._metrics_lock:
+                    self._metrics["written"] += len(batch)
+                    self._metrics["batches"] += 1
+                    self._metrics["max_batch"] = max(self._metrics["max_batch"], len(batch))
+                FEEDBACK_BATCH_VOTES.observe(len(batch))
+                return
+
+        print(f"❌ Dropping {len(batch)} feedback votes after {FEEDBACK_MAX_ATTEMPTS} attempts")
+        self._count("dropped", len(batch))
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            return {"queue_depth": self._queue.qsize(), **self._metrics}
+
+
+feedback_writer = FeedbackWriter()
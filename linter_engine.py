@@ -1,42 +1,277 @@
-import subprocess
-import tempfile
-from pathlib import Path
+import ast
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
 
+from pyflakes import checker
 
-def run_python_linter(code: str):
-    """
-    Runs flake8 on the code string.
+from metrics import LINT_SECONDS
+from parser_engine import get_parser, has_native_grammar, resolve_language_key, split_context
 
-    Returns a list of error strings.
-    """
-    # Create a temporary file
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as temp:
-        temp.write(code)
-        temp_path = temp.name
+# Same selection the flake8 subprocess used to run with:
+# E9,F63,F7,F82 = Syntax errors, comparison issues, control flow and undefined names
+PYFLAKES_CODES = {
+    "AssertTuple": "F631",
+    "IsLiteral": "F632",
+    "InvalidPrintSyntax": "F633",
+    "IfTuple": "F634",
+    "BreakOutsideLoop": "F701",
+    "ContinueOutsideLoop": "F702",
+    "YieldOutsideFunction": "F704",
+    "ReturnOutsideFunction": "F706",
+    "DefaultExceptNotLast": "F707",
+    "ForwardAnnotationSyntaxError": "F722",
+    "UndefinedName": "F821",
+    "UndefinedExport": "F822",
+    "UndefinedLocal": "F823",
+}
+
+LINT_CACHE_SIZE = int(os.getenv("LINT_CACHE_SIZE", "512"))
+
+# Loops nested at least this deep get flagged (3 nested loops ~ O(n^3))
+MAX_LOOP_DEPTH = int(os.getenv("LINT_MAX_LOOP_DEPTH", "3"))
+
+# Statement containers whose trailing statements can become unreachable.
+# Switch/case bodies are deliberately absent: `break; case X:` is fine.
+BLOCK_TYPES = {"block", "statement_block", "compound_statement"}
+
+TERMINATOR_TYPES = {
+    "return_statement",
+    "throw_statement",
+    "raise_statement",
+    "break_statement",
+    "continue_statement",
+}
+
+# Siblings that may legally follow a terminator (hoisted or not executable)
+UNREACHABLE_EXEMPT_TYPES = {
+    "comment",
+    "line_comment",
+    "block_comment",
+    "labeled_statement",
+    "function_declaration",
+}
+
+LOOP_TYPES = {
+    "for_statement",
+    "for_in_statement",
+    "for_range_loop",
+    "enhanced_for_statement",
+    "foreach_statement",
+    "while_statement",
+    "do_statement",
+}
+
+
+class LintDiagnostic(NamedTuple):
+    line: int
+    column: int
+    code: str
+    message: str
+
+    def format(self) -> str:
+        """Renders the diagnostic the way flake8's default formatter did."""
+        return f"Line:{self.line}:{self.column}: {self.code} {self.message}"
+
+
+_lint_cache: OrderedDict[str, tuple[LintDiagnostic, ...]] = OrderedDict()
+_lint_cache_lock = threading.Lock()
+
+
+def _cached(key: str, compute) -> tuple[LintDiagnostic, ...]:
+    with _lint_cache_lock:
+        if key in _lint_cache:
+            _lint_cache.move_to_end(key)
+            return _lint_cache[key]
 
+    diagnostics = compute()
+
+    with _lint_cache_lock:
+        _lint_cache[key] = diagnostics
+        if len(_lint_cache) > LINT_CACHE_SIZE:
+            _lint_cache.popitem(last=False)
+
+    return diagnostics
+
+
+def _code_key(namespace: str, code: str) -> str:
+    return f"{namespace}:{hashlib.sha256(code.encode('utf-8')).hexdigest()}"
+
+
+def _lint_python(code: str) -> tuple[LintDiagnostic, ...]:
     try:
-        # Run flake8
-        # E9,F63,F7,F82 = Syntax errors and undefined names
-        result = subprocess.run(  # noqa: S603
-            ["flake8", temp_path, "--select=E9,F63,F7,F82", "--format=default"],  # noqa: S607
-            check=False,
-            capture_output=True,
-            text=True,
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        # flake8 reports the 1-based offset shifted by one more column
+        return (
+            LintDiagnostic(
+                e.lineno or 1,
+                (e.offset or 0) + 1,
+                "E999",
+                f"SyntaxError: {e.msg}",
+            ),
         )
 
-        # Parse output
-        errors = []
-        if result.stdout:
-            for line in result.stdout.splitlines():
-                # Clean up the path from the message
-                clean_msg = line.replace(temp_path, "Line")
-                errors.append(clean_msg)
+    flakes = checker.Checker(tree, filename="<code>")
+    diagnostics = []
+    for message in flakes.messages:
+        code = PYFLAKES_CODES.get(type(message).__name__)
+        if code:
+            diagnostics.append(
+                LintDiagnostic(
+                    message.lineno,
+                    message.col + 1,
+                    code,
+                    message.message % message.message_args,
+                ),
+            )
+
+    diagnostics.sort(key=lambda d: (d.line, d.column))
+    return tuple(diagnostics)
+
+
+def lint_python_source(code: str) -> tuple[LintDiagnostic, ...]:
+    """
+    Lints Python source in-process (no temp file, no flake8 fork).
+
+    Results are memoized per exact source text, so re-submitting an
+    unchanged file costs a hash lookup.
+    """
+    return _cached(_code_key("pyflakes", code), lambda: _lint_python(code))
+
+
+def _diagnostic_at(node, code: str, message: str) -> LintDiagnostic:
+    return LintDiagnostic(node.start_point[0] + 1, node.start_point[1] + 1, code, message)
+
 
+def _is_empty_handler(node) -> bool:
+    """True for catch blocks with no statements, or Python `except: pass`."""
+    body = node.child_by_field_name("body")
+    if body is None:
+        # Python's except_clause has no body field; its block is the last child
+        body = node.named_children[-1] if node.named_children else None
+    if body is None:
+        return False
+
+    statements = [c for c in body.named_children if "comment" not in c.type]
+    if node.type == "except_clause":
+        return all(c.type == "pass_statement" for c in statements)
+    return not statements
+
+
+def collect_tree_diagnostics(
+    root_node,
+    include_syntax: bool = True,  # noqa: FBT001, FBT002
+) -> tuple[LintDiagnostic, ...]:
+    """
+    Cheap structural checks over an existing tree-sitter tree.
+
+    Reports ERROR/MISSING nodes, code after return/throw/break/continue,
+    empty catch blocks and deeply nested loops, in a single walk.
+    """
+    diagnostics = []
+
+    # (node, number of enclosing loops)
+    stack = [(root_node, 0)]
+    while stack:
+        node, loop_depth = stack.pop()
+
+        if include_syntax:
+            if node.is_missing:
+                diagnostics.append(
+                    _diagnostic_at(node, "TS002", f"Missing '{node.type}'"),
+                )
+            elif node.type == "ERROR":
+                snippet = node.text.decode("utf8", errors="replace").split("\n")[0][:40]
+                diagnostics.append(
+                    _diagnostic_at(node, "TS001", f"Syntax error near '{snippet}'"),
+                )
+
+        if node.type in TERMINATOR_TYPES and node.parent and node.parent.type in BLOCK_TYPES:
+            sibling = node.next_named_sibling
+            while sibling is not None and sibling.type in UNREACHABLE_EXEMPT_TYPES:
+                sibling = sibling.next_named_sibling
+            if sibling is not None:
+                keyword = node.type.removesuffix("_statement")
+                diagnostics.append(
+                    _diagnostic_at(sibling, "TS101", f"Unreachable code after '{keyword}'"),
+                )
+
+        if node.type in ("catch_clause", "except_clause") and _is_empty_handler(node):
+            diagnostics.append(
+                _diagnostic_at(node, "TS102", "Empty catch block silently swallows errors"),
+            )
+
+        if node.type in LOOP_TYPES:
+            loop_depth += 1
+            if loop_depth == MAX_LOOP_DEPTH:
+                diagnostics.append(
+                    _diagnostic_at(
+                        node,
+                        "TS103",
+                        f"Loops nested {loop_depth} levels deep (likely O(n^{loop_depth}))",
+                    ),
+                )
+
+        stack.extend((child, loop_depth) for child in reversed(node.children))
+
+    diagnostics.sort(key=lambda d: (d.line, d.column))
+    return tuple(diagnostics)
+
+
+def lint_file(code: str, language: str, tree=None) -> tuple[LintDiagnostic, ...]:
+    """
+    File-level diagnostics for every language in STRATEGIES.
+
+    Pass the tree from TreeSitterParser.parse to avoid parsing twice;
+    unsupported languages get no diagnostics, and languages parsed with a
+    borrowed grammar (e.g. TypeScript) get no syntax diagnostics.
+    """
+    key = resolve_language_key(language)
+    if not key:
+        return ()
+    native = has_native_grammar(language)
+
+    def compute():
+        nonlocal tree
+        if tree is None:
+            tree = get_parser().parse(code, key)
+
+        if key == "python":
+            # pyflakes owns syntax errors for Python; the tree adds structure checks
+            diagnostics = lint_python_source(code) + collect_tree_diagnostics(
+                tree.root_node,
+                include_syntax=False,
+            )
+            return tuple(sorted(diagnostics, key=lambda d: (d.line, d.column)))
+
+        return collect_tree_diagnostics(tree.root_node, include_syntax=native)
+
+    try:
+        with LINT_SECONDS.time(language=key):
+            return _cached(_code_key(key if native else f"{key}-borrowed", code), compute)
     except Exception as e:  # noqa: BLE001
         print(f"Linter failed: {e}")
-        return []
-    else:
-        print(errors)
-        return errors
-    finally:
-        Path(temp_path).unlink(missing_ok=True)
+        return ()
+
+
+def assign_linter_errors(functions: list[dict], diagnostics: tuple[LintDiagnostic, ...]):
+    """
+    Attaches each file-level diagnostic to the function whose line range holds it.
+
+    Lines are renumbered to the function's code payload (context block
+    first, then the function from its own first line), since that is the
+    text the expert sees, as the old per-function flake8 run reported them.
+    """
+    for func in functions:
+        _, function_source = split_context(func["code"])
+        context_lines = func["code"][: len(func["code"]) - len(function_source)].count("\n")
+        offset = context_lines - (func["start_line"] - 1)
+        func["linter_errors"] = [
+            d._replace(line=d.line + offset).format()
+            for d in diagnostics
+            if func["start_line"] <= d.line <= func["end_line"]
+        ]
+
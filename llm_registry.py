@@ -0,0 +1,51 @@
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+from langchain_core.language_models import BaseChatModel
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+load_dotenv()
+
+EXPERT_MODEL = os.getenv("EXPERT_MODEL", "gemini-2.5-flash")
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gemini-2.5-flash")
+# Cheaper model for functions the static triage marks as simple
+LIGHT_EXPERT_MODEL = os.getenv("LIGHT_EXPERT_MODEL", "gemini-2.5-flash-lite")
+# "gemini", or "stub" for the deterministic offline model in stub_llm.py (load tests)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+
+@lru_cache(maxsize=None)
+def get_llm(model: str, temperature: float) -> BaseChatModel:
+    """
+    One Gemini client per (model, temperature) for the whole process.
+
+    Reusing the client keeps its HTTP connection pool warm across requests
+    instead of paying a fresh TLS handshake on every call.
+    """
+    if LLM_BACKEND == "stub":
+        from stub_llm import StubChatModel  # noqa: PLC0415
+
+        return StubChatModel(model=model, temperature=temperature)
+    if LLM_BACKEND != "gemini":
+        msg = f"Unknown LLM_BACKEND: {LLM_BACKEND!r} (expected 'gemini' or 'stub')."
+        raise ValueError(msg)
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        msg = "GOOGLE_API_KEY not found."
+        raise ValueError(msg)
+
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        google_api_key=api_key,
+        # Retries are owned by llm_scheduler so they respect the shared rate limits
+        max_retries=1,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_structured_llm(schema: type, model: str, temperature: float):
+    """Structured-output binding of the shared client for a Pydantic schema."""
+    return get_llm(model, temperature).with_structured_output(schema)
@@ -0,0 +1,254 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+from collections.abc import Awaitable, Callable
+from enum import IntEnum
+from typing import TypeVar
+
+from metrics import LLM_QUEUE_WAIT_SECONDS
+
+T = TypeVar("T")
+
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "600"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "256"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_MARKERS = ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "429", "503")
+
+
+class Priority(IntEnum):
+    """Lower value is served first."""
+
+    INTERACTIVE = 0  # /chat
+    STANDARD = 1  # /analyze
+    BULK = 2  # batch jobs
+
+
+class SchedulerQueueFullError(RuntimeError):
+    """Raised instead of queueing when too many LLM calls are already waiting."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for quota, overload and transient network errors anywhere in the cause chain."""
+    current: BaseException | None = error
+    while current is not None:
+        if isinstance(current, (TimeoutError, ConnectionError)):
+            return True
+        code = getattr(current, "code", None) or getattr(current, "status_code", None)
+        if code in RETRYABLE_STATUS_CODES:
+            return True
+        if any(marker in str(current) for marker in RETRYABLE_MARKERS):
+            return True
+        current = current.__cause__
+    return False
+
+
+class TokenBucket:
+    """Refills continuously at ``per_minute`` units, holding at most one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` units are available (0 if they are now)."""
+        self._refill(now)
+        # Requests bigger than the bucket only need it full, or they'd wait forever
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self.level = min(self.capacity, self.level + min(amount, self.capacity))
+
+
+class LLMScheduler:
+    """
+    Single gate for every Gemini call in the process.
+
+    Callers wait in one priority queue (interactive before standard before
+    bulk, FIFO within a class) until both the request and the token bucket
+    allow them through. Retryable failures go back through the queue after
+    a jittered exponential backoff.
+
+    Waiters are futures on the event loop, woken by a loop timer when the
+    buckets refill, so queueing costs no thread and all callers must share
+    one running loop.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = TOKENS_PER_MINUTE,
+        max_queue: int = MAX_QUEUE,
+        max_retries: int = MAX_RETRIES,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        # (priority, sequence, tokens, enqueued at, future)
+        self._waiting: list[tuple[int, int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup: asyncio.TimerHandle | None = None
+        self._metrics = {
+            "admitted": 0,
+            "rejected": 0,
+            "cancelled": 0,
+            "retries": 0,
+            "failed": 0,
+            "max_queue_depth": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _delay(self, tokens: int, now: float) -> float:
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def _consume(self, priority: int, tokens: int, waited: float):
+        """Takes one call's share of the buckets."""
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+        LLM_QUEUE_WAIT_SECONDS.observe(waited, priority=Priority(priority).name.lower())
+        self._metrics["admitted"] += 1
+        self._metrics["wait_seconds_total"] += waited
+        self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], waited)
+
+    def _refund(self, tokens: int):
+        """Gives back the share of a call that was admitted but never started."""
+        self.requests.refund(1)
+        self.tokens.refund(tokens)
+        self._metrics["admitted"] -= 1
+
+    def _dispatch(self):
+        """Admits waiters from the head of the queue, then sleeps until the head can go."""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._waiting:
+            priority, _, tokens, enqueued, future = self._waiting[0]
+            if future.done():
+                # Cancelled; its task has not resumed to remove the ticket yet
+                heapq.heappop(self._waiting)
+                continue
+            now = time.monotonic()
+            delay = self._delay(tokens, now)
+            if delay > 0:
+                self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiting)
+            self._consume(priority, tokens, now - enqueued)
+            future.set_result(None)
+
+    async def _acquire(self, priority: Priority, tokens: int):
+        if not self._waiting and self._delay(tokens, time.monotonic()) <= 0:
+            self._consume(priority, tokens, 0.0)
+            return
+
+        if len(self._waiting) >= self.max_queue:
+            self._metrics["rejected"] += 1
+            msg = f"LLM queue is full ({self.max_queue} calls waiting). Try again shortly."
+            raise SchedulerQueueFullError(msg)
+
+        future = asyncio.get_running_loop().create_future()
+        ticket = (int(priority), next(self._sequence), tokens, time.monotonic(), future)
+        heapq.heappush(self._waiting, ticket)
+        self._metrics["max_queue_depth"] = max(
+            self._metrics["max_queue_depth"],
+            len(self._waiting),
+        )
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A caller that went away (client disconnect, abandoned single
+            # flight) must not spend rate-limit budget
+            self._metrics["cancelled"] += 1
+            if not future.cancelled():
+                self._refund(tokens)
+            elif ticket in self._waiting:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+            self._dispatch()
+            raise
+
+    async def aadmit(
+        self,
+        priority: Priority = Priority.STANDARD,
+        estimated_tokens: int = 0,
+    ):
+        """
+        Waits until one call may start, for callers that run it themselves.
+
+        Used by streams: once tokens have been forwarded a failed call can't
+        be replayed, so there is no retry here.
+        """
+        await self._acquire(priority, estimated_tokens)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))  # noqa: S311
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        priority: Priority = Priority.STANDARD,
+        estimated_tokens: int = 0,
+    ) -> T:
+        """Awaits ``fn()`` once admitted, retrying retryable errors with backoff."""
+        attempt = 0
+        while True:
+            await self._acquire(priority, estimated_tokens)
+            try:
+                return await fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._metrics["failed"] += 1
+                    raise
+                self._metrics["retries"] += 1
+                delay = self._backoff(attempt)
+                print(f"⏳ Retryable LLM error, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def stats(self) -> dict:
+        admitted = self._metrics["admitted"]
+        return {
+            "queue_depth": len(self._waiting),
+            "max_queue": self.max_queue,
+            **{
+                key: round(value, 4) if isinstance(value, float) else value
+                for key, value in self._metrics.items()
+            },
+            "wait_seconds_avg": round(
+                self._metrics["wait_seconds_total"] / admitted if admitted else 0.0,
+                4,
+            ),
+        }
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,253 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+from contextlib import contextmanager
+from functools import wraps
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Seconds: from sub-millisecond parses up to slow LLM calls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)  # fmt: skip
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values, strict=True)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            *self.header(),
+            *(
+                f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+                for key, value in values.items()
+            ),
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; observe() is one bisect and three adds under a lock."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = {key: (list(s[0]), s[1], s[2]) for key, s in self._series.items()}
+        lines = self.header()
+        for key, (counts, total, count) in snapshot.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts, strict=True):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.register(
+    Histogram(
+        "codesensei_http_request_seconds",
+        "HTTP request latency until the response starts.",
+        ("method", "route", "status"),
+    ),
+)
+GRAPH_NODE_SECONDS = registry.register(
+    Histogram(
+        "codesensei_graph_node_seconds",
+        "Time spent in each LangGraph node (guardrail, linter, triage, experts).",
+        ("node",),
+    ),
+)
+PARSE_SECONDS = registry.register(
+    Histogram(
+        "codesensei_parse_seconds",
+        "tree-sitter parse and function extraction time.",
+        ("language", "stage"),
+    ),
+)
+LINT_SECONDS = registry.register(
+    Histogram("codesensei_lint_seconds", "File-level lint time.", ("language",)),
+)
+STREAM_FIRST_RESULT_SECONDS = registry.register(
+    Histogram(
+        "codesensei_stream_first_result_seconds",
+        "Time until a streaming endpoint sends its first result "
+        "(first analysis on /analyze/stream, first token on /chat/stream).",
+        ("endpoint",),
+    ),
+)
+LLM_SECONDS = registry.register(
+    Histogram(
+        "codesensei_llm_seconds",
+        "LLM call latency per expert/caller, including scheduler wait and retries.",
+        ("caller", "model"),
+    ),
+)
+LLM_QUEUE_WAIT_SECONDS = registry.register(
+    Histogram(
+        "codesensei_llm_queue_wait_seconds",
+        "Time an LLM call waited for the scheduler to admit it.",
+        ("priority",),
+    ),
+)
+LLM_TOKENS = registry.register(
+    Histogram(
+        "codesensei_llm_tokens",
+        "Estimated tokens per LLM call (~4 characters per token).",
+        ("caller", "direction"),
+        buckets=TOKEN_BUCKETS,
+    ),
+)
+LLM_ERRORS = registry.register(
+    Counter("codesensei_llm_errors_total", "Failed LLM calls per caller.", ("caller",)),
+)
+ANALYSIS_CACHE_REQUESTS = registry.register(
+    Counter(
+        "codesensei_analysis_cache_requests_total",
+        "Analysis cache lookups by result (hit, miss, bypass).",
+        ("result",),
+    ),
+)
+DB_WRITE_SECONDS = registry.register(
+    Histogram(
+        "codesensei_db_write_seconds",
+        "Latency of database write transactions (feedback batches, analysis cache puts).",
+        ("operation",),
+    ),
+)
+FEEDBACK_BATCH_VOTES = registry.register(
+    Histogram(
+        "codesensei_feedback_batch_votes",
+        "Votes per group-committed feedback batch.",
+        buckets=SIZE_BUCKETS,
+    ),
+)
+
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Wraps an async LangGraph node so its duration lands in GRAPH_NODE_SECONDS."""
+
+    @wraps(node)
+    async def timed_node(state):
+        with GRAPH_NODE_SECONDS.time(node=name):
+            return await node(state)
+
+    return timed_node
+
+
+@contextmanager
+def track_llm_call(caller: str, model: str, input_tokens: int):
+    """Times one LLM call (scheduler wait and retries included) and counts its failure."""
+    LLM_TOKENS.observe(input_tokens, caller=caller, direction="input")
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        LLM_ERRORS.inc(caller=caller)
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, caller=caller, model=model)
+
+
+def observe_output_tokens(caller: str, tokens: int):
+    LLM_TOKENS.observe(tokens, caller=caller, direction="output")
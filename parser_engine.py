@@ -1,3 +1,9 @@
+import os
+import queue
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
 from typing import Any
 
 import tree_sitter_c_sharp as tree_sitter_csharp
@@ -5,13 +11,48 @@ import tree_sitter_cpp
 import tree_sitter_java
 import tree_sitter_javascript
 import tree_sitter_python
-from tree_sitter import Language, Parser
+from tree_sitter import Language, Parser, Query, QueryCursor
+
+from llm_scheduler import estimate_tokens
+from metrics import PARSE_SECONDS
+
+# Max estimated tokens of dependency skeletons prepended to each function.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "512"))
+
+CONTEXT_HEADER = "### CONTEXT (Dependencies detected via Static Analysis) ###"
+
+IDENTIFIER_TYPES = ("identifier", "type_identifier")
+
+
+def split_context(payload: str) -> tuple[list[str], str]:
+    """Splits an extracted function's code into (dependency skeletons, function source)."""
+    if not payload.startswith(CONTEXT_HEADER):
+        return [], payload
+    context_block, _, function_source = payload.partition("\n\n")
+    return context_block.split("\n")[1:], function_source
 
 
 class LanguageStrategy:
     def __init__(self, lang_module, function_node_types):
         self.language = Language(lang_module.language())
         self.function_node_types = function_node_types
+        # Compiled once at import; matching then runs inside tree-sitter's C code
+        self.scan_query = Query(self.language, self._scan_query_source())
+
+    def _scan_query_source(self) -> str:
+        """One query capturing functions, identifier usages and ERROR nodes."""
+        identifier_types = [
+            node_type
+            for node_type in IDENTIFIER_TYPES
+            # Not every grammar has every name type (e.g. no type_identifier in C#)
+            if self.language.id_for_node_kind(node_type, True) is not None  # noqa: FBT003
+        ]
+        patterns = [f"({node_type}) @function" for node_type in self.function_node_types]
+        patterns.append(
+            "[" + " ".join(f"({node_type})" for node_type in identifier_types) + "] @identifier",
+        )
+        patterns.append("(ERROR) @error")
+        return "\n".join(patterns)
 
 
 STRATEGIES = {
@@ -31,46 +72,198 @@ STRATEGIES = {
     ),
 }
 
+# Request labels that map onto a grammar under a different key
+LANGUAGE_ALIASES = {
+    "c": "cpp",
+    "c++": "cpp",
+    "js": "javascript",
+    "ts": "javascript",
+    "typescript": "javascript",
+    "c#": "csharp",
+    "cs": "csharp",
+}
+
+
+# Aliases for a different language that borrows a neighbour's grammar. The
+# tree is fine for functions and structure, but its ERROR nodes are often
+# valid code in the real language (TypeScript annotations, C's `new` as a name)
+FOREIGN_GRAMMAR_ALIASES = {"c", "ts", "typescript"}
+
+
+def resolve_language_key(lang_name: str) -> str | None:
+    """Maps a request language label to its STRATEGIES key (None if unsupported)."""
+    key = lang_name.lower()
+    key = LANGUAGE_ALIASES.get(key, key)
+    return key if key in STRATEGIES else None
+
+
+def has_native_grammar(lang_name: str) -> bool:
+    """False when the label is parsed with another language's grammar."""
+    return lang_name.lower() not in FOREIGN_GRAMMAR_ALIASES
+
+
+class ParserPool:
+    """
+    Thread-safe pool of language-bound tree-sitter Parsers.
+
+    A Parser is not safe to share between concurrent parses, so each call
+    borrows one for its language and returns it afterwards.
+    """
+
+    def __init__(self, max_idle_per_language: int = 8):
+        self.max_idle_per_language = max_idle_per_language
+        self._idle = {key: queue.LifoQueue() for key in STRATEGIES}
+
+    @contextmanager
+    def borrow(self, key: str):
+        idle = self._idle[key]
+        try:
+            parser = idle.get_nowait()
+        except queue.Empty:
+            parser = Parser(STRATEGIES[key].language)
+        try:
+            yield parser
+        finally:
+            if idle.qsize() < self.max_idle_per_language:
+                idle.put_nowait(parser)
+
+
+parser_pool = ParserPool()
+
+
+class SourceIndex:
+    """
+    UTF-8 view of a source file with precomputed line start offsets.
+
+    Tree-sitter positions are byte based, so slicing the encoded source is
+    exact and avoids re-splitting the whole file for every function.
+    """
+
+    def __init__(self, code: str):
+        self.data = code.encode("utf8")
+        self.line_starts = [0]
+        newline = self.data.find(b"\n")
+        while newline != -1:
+            self.line_starts.append(newline + 1)
+            newline = self.data.find(b"\n", newline + 1)
+
+    def _line_end(self, row: int) -> int:
+        """Byte offset of the end of a line, excluding its newline."""
+        if row + 1 < len(self.line_starts):
+            return self.line_starts[row + 1] - 1
+        return len(self.data)
+
+    def lines_text(self, first_row: int, last_row: int) -> str:
+        """Text of rows first_row..last_row (0-based, inclusive)."""
+        start = self.line_starts[first_row]
+        return self.data[start : self._line_end(last_row)].decode("utf8", errors="replace")
+
+    def line_text(self, row: int) -> str:
+        return self.lines_text(row, row)
+
+    def node_text(self, node) -> str:
+        return self.data[node.start_byte : node.end_byte].decode("utf8", errors="replace")
+
+
+class TreeScan:
+    """Everything extract_functions needs from one walk over the tree."""
 
-class TreeSitterParser:
     def __init__(self):
-        self.parser = Parser()
+        self.total_nodes = 0
+        self.error_nodes = 0
+        self.function_nodes = []
+        # Parallel lists, sorted by start byte (pre-order = document order)
+        self.identifier_starts: list[int] = []
+        self.identifier_names: list[str] = []
 
-    def extract_functions(self, code: str, lang_name: str = "python"):
-        # 1. Setup
-        key = lang_name.lower().replace("#", "sharp").replace("++", "cpp")
-        strategy = STRATEGIES.get(key)
-        if not strategy:
+
+class TreeSitterParser:
+    """
+    Stateless extraction engine.
+
+    Safe to share between concurrent requests: parsers come from the pool and
+    queries are precompiled per language.
+    """
+
+    def _resolve_key(self, lang_name: str) -> str:
+        key = resolve_language_key(lang_name)
+        if not key:
             print(
                 f"⚠️ Warning: Language '{lang_name}' not supported. Defaulting to Python.",
             )
-            strategy = STRATEGIES["python"]
+            key = "python"
+        return key
 
-        self.parser.language = strategy.language
-        tree = self.parser.parse(bytes(code, "utf8"))
-        root_node = tree.root_node
+    def _resolve_strategy(self, lang_name: str) -> LanguageStrategy:
+        return STRATEGIES[self._resolve_key(lang_name)]
 
-        # 2. Validation
-        self._check_syntax_validity(root_node, lang_name)
+    def parse(self, code: str, lang_name: str = "python", old_tree=None):
+        """
+        Parses the code once so the tree can be shared by extraction and linting.
 
-        # 3. GLOBAL SCAN: Build Symbol Table (Name -> Node)
-        # We look for classes, structs, or globals defined at the root level
-        global_symbols = self._build_global_symbol_table(root_node, code)
+        Pass the previous tree (already adjusted with ``tree.edit``) as
+        ``old_tree`` to re-parse incrementally.
+        """
+        key = self._resolve_key(lang_name)
+        with (
+            PARSE_SECONDS.time(language=key, stage="parse"),
+            parser_pool.borrow(key) as parser,
+        ):
+            if old_tree is None:
+                return parser.parse(bytes(code, "utf8"))
+            return parser.parse(bytes(code, "utf8"), old_tree)
+
+    def extract_functions(self, code: str, lang_name: str = "python", tree=None):
+        # 1. Setup
+        strategy = self._resolve_strategy(lang_name)
+        if tree is None:
+            tree = self.parse(code, lang_name)
+        started = time.perf_counter()
+        root_node = tree.root_node
+        source = SourceIndex(code)
 
-        functions: list[dict[str, Any]] = []
+        # 2. SINGLE PASS: functions, identifier usages and error counts together
+        scan = self._scan_tree(root_node, strategy.scan_query)
 
-        # 4. Recursive Walk (Passing the symbol table down)
-        self._find_functions_recursive(
-            root_node,
-            code,
-            functions,
-            strategy.function_node_types,
-            global_symbols,
-        )
+        # 3. Validation
+        self._check_syntax_validity(scan, lang_name)
 
+        # 4. GLOBAL SCAN: Build Symbol Table (Name -> Node)
+        # We look for classes, structs, or globals defined at the root level
+        global_symbols = self._build_global_symbol_table(root_node)
+
+        # 5. Build payloads (the symbol table and skeleton memo are shared per file)
+        skeletons: dict[int, tuple[str, int]] = {}
+        functions: list[dict[str, Any]] = [
+            self._process_node(node, source, scan, global_symbols, skeletons)
+            for node in scan.function_nodes
+        ]
+
+        PARSE_SECONDS.observe(
+            time.perf_counter() - started,
+            language=self._resolve_key(lang_name),
+            stage="extract",
+        )
         return functions
 
-    def _build_global_symbol_table(self, root_node, code):  # noqa: ARG002
+    def extract_top_level_symbols(self, code: str, lang_name: str = "python", tree=None):
+        """Skeletons of the classes, structs and globals defined at the root level."""
+        strategy = self._resolve_strategy(lang_name)
+        if tree is None:
+            tree = self.parse(code, lang_name)
+        source = SourceIndex(code)
+
+        return [
+            {
+                "name": name,
+                "start_line": node.start_point[0] + 1,
+                "skeleton": self._create_skeleton(node, source),
+            }
+            for name, node in self._build_global_symbol_table(tree.root_node).items()
+            if node.type not in strategy.function_node_types
+        ]
+
+    def _build_global_symbol_table(self, root_node):
         """Scans top-level definitions to find dependencies (Classes, Structs, Globals)."""
         symbols = {}
         for child in root_node.children:
@@ -79,35 +272,51 @@ class TreeSitterParser:
                 symbols[name] = child
         return symbols
 
-    def _find_functions_recursive(
+    def _scan_tree(self, root_node, scan_query) -> "TreeScan":
+        """
+        Runs the precompiled scan query once over the whole tree.
+
+        Captures are sorted into document order: functions in pre-order
+        (outer before inner) and identifiers by start byte, so per-function
+        lookups can bisect instead of re-walking.
+        """
+        captures = QueryCursor(scan_query).captures(root_node)
+
+        scan = TreeScan()
+        scan.total_nodes = root_node.descendant_count
+        scan.error_nodes = len(captures.get("error", ()))
+        scan.function_nodes = sorted(
+            captures.get("function", ()),
+            key=lambda node: (node.start_byte, -node.end_byte),
+        )
+
+        identifiers = sorted(captures.get("identifier", ()), key=lambda node: node.start_byte)
+        scan.identifier_starts = [node.start_byte for node in identifiers]
+        scan.identifier_names = [node.text.decode("utf8") for node in identifiers]
+
+        return scan
+
+    def _process_node(
         self,
         node,
-        code,
-        functions,
-        target_types,
-        global_symbols,
+        source: "SourceIndex",
+        scan: "TreeScan",
+        global_symbols: dict,
+        skeletons: dict,
     ):
-        if node.type in target_types:
-            functions.append(self._process_node(node, code, global_symbols))
-
-        for child in node.children:
-            self._find_functions_recursive(
-                child,
-                code,
-                functions,
-                target_types,
-                global_symbols,
-            )
-
-    def _process_node(self, node, full_code: str, global_symbols: dict):
         start_line = node.start_point[0] + 1
         end_line = node.end_point[0] + 1
 
-        lines = full_code.split("\n")
-        function_source = "\n".join(lines[start_line - 1 : end_line])
+        function_source = source.lines_text(start_line - 1, end_line - 1)
 
         # --- STATIC ANALYSIS: CONTEXT EXTRACTION ---
-        context_block = self._extract_dependencies(node, full_code, global_symbols)
+        context_block, context_stats = self._extract_dependencies(
+            node,
+            source,
+            scan,
+            global_symbols,
+            skeletons,
+        )
 
         # If context exists, prepend it to the code sent to AI
         if context_block:
@@ -117,7 +326,7 @@ class TreeSitterParser:
 
         # Body for hashing
         body_node = node.child_by_field_name("body")
-        body_text = body_node.text.decode("utf8") if body_node else ""
+        body_text = source.node_text(body_node) if body_node else ""
 
         return {
             "name": self._get_name(node),
@@ -125,61 +334,78 @@ class TreeSitterParser:
             "end_line": end_line,
             "code": final_code_payload,  # AI gets Context + Function
             "body_only": body_text,
+            "context": context_stats,
         }
 
-    def _extract_dependencies(self, function_node, full_code, global_symbols):
-        """Finds identifiers used inside the function that match global definitions."""
-        used_identifiers = set()
+    def _extract_dependencies(
+        self,
+        function_node,
+        source: "SourceIndex",
+        scan: "TreeScan",
+        global_symbols: dict,
+        skeletons: dict,
+    ):
+        """
+        Packs skeletons of the global symbols the function uses into a context block.
+
+        Dependencies are ranked by how often the function uses them, then by
+        how close their definition is, and added until CONTEXT_TOKEN_BUDGET
+        is spent. Returns the block and a summary of what was included.
+        """
         function_name = self._get_name(function_node)
+        function_row = function_node.start_point[0]
 
-        # Walk the function body to find usages
-        cursor = function_node.walk()
-
-        # Helper to traverse entire subtree
-        visited_children = False
-        while True:
-            # Tree-sitter types for names: 'identifier', 'type_identifier', 'field_identifier'
-            if cursor.node.type in ["identifier", "type_identifier"]:
-                name = cursor.node.text.decode("utf8")
-                if name != function_name:  # Don't match self-recursion
-                    used_identifiers.add(name)
-
-            if (
-                not visited_children and cursor.goto_first_child()
-            ) or cursor.goto_next_sibling():
-                visited_children = False
-            elif cursor.goto_parent():
-                visited_children = True
-            else:
-                break
+        # Identifiers inside the function's byte range (collected during the scan)
+        first = bisect_left(scan.identifier_starts, function_node.start_byte)
+        last = bisect_left(scan.identifier_starts, function_node.end_byte)
+        usage_counts = Counter(scan.identifier_names[first:last])
+        usage_counts.pop(function_name, None)  # Don't match self-recursion
 
         # Match Usages to Definitions
-        context_snippets = []
-        for identifier in used_identifiers:
-            if identifier in global_symbols:
-                def_node = global_symbols[identifier]
-                skeleton = self._create_skeleton(def_node, full_code)
-                context_snippets.append(skeleton)
-
+        candidates = []
+        for identifier, uses in usage_counts.items():
+            def_node = global_symbols.get(identifier)
+            if def_node is None:
+                continue
+            if def_node.id not in skeletons:
+                skeleton = self._create_skeleton(def_node, source)
+                skeletons[def_node.id] = (skeleton, estimate_tokens(skeleton))
+            distance = abs(def_node.start_point[0] - function_row)
+            candidates.append((-uses, distance, skeletons[def_node.id]))
+        candidates.sort(key=lambda candidate: candidate[:2])
+
+        # Greedy packing: a dependency that doesn't fit is dropped, smaller ones may still fit
+        budget = CONTEXT_TOKEN_BUDGET - estimate_tokens(CONTEXT_HEADER)
+        context_snippets: list[str] = []
+        seen: set[str] = set()
+        tokens = dropped = 0
+        for _, _, (skeleton, cost) in candidates:
+            if skeleton in seen:
+                continue
+            seen.add(skeleton)
+            if tokens + cost > budget:
+                dropped += 1
+                continue
+            context_snippets.append(skeleton)
+            tokens += cost
+
+        stats = {"included": len(context_snippets), "dropped": dropped, "tokens": tokens}
         if not context_snippets:
-            return ""
+            return "", stats
 
-        return (
-            "### CONTEXT (Dependencies detected via Static Analysis) ###\n"
-            + "\n".join(context_snippets)
-        )
+        stats["tokens"] += estimate_tokens(CONTEXT_HEADER)
+        return CONTEXT_HEADER + "\n" + "\n".join(context_snippets), stats
 
-    def _create_skeleton(self, node, full_code):
+    def _create_skeleton(self, node, source: "SourceIndex"):
         """
         Creates a token-efficient summary.
 
         e.g., 'class User { ... }' instead of the whole class.
         """
-        lines = full_code.split("\n")
         start_line = node.start_point[0]
 
         # Heuristic: Grab the signature line
-        header = lines[start_line].strip()
+        header = source.line_text(start_line).strip()
 
         # Check if it's a block-based structure (Class/Struct)
         if "{" in header or ":" in header:
@@ -193,35 +419,23 @@ class TreeSitterParser:
             name_node = node.child_by_field_name("declarator")
         return name_node.text.decode("utf8") if name_node else "anonymous"
 
-    def _check_syntax_validity(self, root_node, lang_name):
-        total_nodes = 0
-        error_nodes = 0
-        cursor = root_node.walk()
-        visited_children = False
-        while True:
-            total_nodes += 1
-            if cursor.node.type == "ERROR":
-                error_nodes += 1
-            if (
-                not visited_children and cursor.goto_first_child()
-            ) or cursor.goto_next_sibling():
-                visited_children = False
-            elif cursor.goto_parent():
-                visited_children = True
-            else:
-                break
-        if total_nodes > 0 and (error_nodes / total_nodes) > 0.05:  # noqa: PLR2004
+    def _check_syntax_validity(self, scan: "TreeScan", lang_name):
+        if scan.total_nodes > 0 and (scan.error_nodes / scan.total_nodes) > 0.05:  # noqa: PLR2004
             msg = f"High syntax error rate. Are you sure this is {lang_name}?"
             raise ValueError(
                 msg,
             )
 
 
+_shared_parser = TreeSitterParser()
+
+
 def get_parser():
     """
-    Creates a new parser instance for each request.
+    Returns the process-wide parser.
 
-    This prevents race conditions where Request A changes the language
-    while Request B is parsing.
+    There is no per-request setup: each parse borrows its own language-bound
+    Parser from the pool, so Request A can never change the language while
+    Request B is parsing.
     """
-    return TreeSitterParser()
+    return _shared_parser
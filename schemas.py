@@ -4,6 +4,27 @@ from pydantic import BaseModel, Field
 class CodeRequest(BaseModel):
     code: str
     language: str = "python"
+    max_concurrency: int | None = Field(
+        default=None,
+        ge=1,
+        description="Functions analyzed in parallel (1 = sequential). Capped server-side.",
+    )
+    use_cache: bool = Field(
+        default=True,
+        description="Set to False to bypass cached analyses and force a fresh LLM call.",
+    )
+
+
+class CodeEdit(BaseModel):
+    start_byte: int = Field(..., ge=0, description="UTF-8 byte offset where the edit starts")
+    old_end_byte: int = Field(..., ge=0, description="UTF-8 byte offset where the replaced text ended")
+    new_text: str = Field(..., description="Replacement text (empty for deletions)")
+
+
+class SessionEditRequest(BaseModel):
+    edits: list[CodeEdit]
+    max_concurrency: int | None = Field(default=None, ge=1)
+    use_cache: bool = True
 
 
 class FeedbackRequest(BaseModel):
@@ -11,6 +32,7 @@ class FeedbackRequest(BaseModel):
     code: str
     explanation: str
     rating: int  # 1 or -1
+    language: str | None = None
 
 
 class CodeIssue(BaseModel):
@@ -52,6 +74,21 @@ class CodeSenseiAnalysis(BaseModel):
     )
 
 
+class FunctionAnalysis(BaseModel):
+    function_name: str = Field(
+        ...,
+        description="The function name exactly as given in its '### FUNCTION' header",
+    )
+    analysis: CodeSenseiAnalysis
+
+
+class BatchAnalysis(BaseModel):
+    analyses: list[FunctionAnalysis] = Field(
+        ...,
+        description="One entry per function in the request, in the same order.",
+    )
+
+
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
     content: str
@@ -62,3 +99,16 @@ class ChatRequest(BaseModel):
     code_context: str
     language: str
     history: list[ChatMessage] = []
+
+
+class ChatSessionRequest(BaseModel):
+    code_context: str
+    language: str
+
+
+class ChatSessionMessage(BaseModel):
+    message: str
+    code_context: str | None = Field(
+        default=None,
+        description="Replaces the session's stored code context (e.g. after the file changed).",
+    )
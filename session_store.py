@@ -0,0 +1,106 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+
+class SessionStore:
+    """
+    In-memory session registry with idle-timeout and memory-cap eviction.
+
+    Sessions are kept in least-recently-used order. Expired sessions are
+    dropped lazily on every access, and the oldest ones are evicted whenever
+    the session count or the estimated total size goes over its cap.
+    """
+
+    def __init__(
+        self,
+        idle_timeout_seconds: float,
+        max_sessions: int,
+        max_bytes: int,
+        size_of: Callable[[Any], int],
+    ):
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.evictions = 0
+        # session_id -> (value, last_used, size)
+        self._sessions: OrderedDict[str, tuple[Any, float, int]] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def create(self, value: Any) -> str:
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._put(session_id, value)
+        return session_id
+
+    def get(self, session_id: str) -> Any | None:
+        """Returns the session (refreshing its idle timer) or None if gone."""
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions[session_id] = (entry[0], time.monotonic(), entry[2])
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def update(self, session_id: str, value: Any):
+        """Re-measures a session after it changed (and re-applies the caps)."""
+        with self._lock:
+            if session_id in self._sessions:
+                self._put(session_id, value)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is None:
+                return False
+            self._total_bytes -= entry[2]
+            return True
+
+    def _put(self, session_id: str, value: Any):
+        old = self._sessions.pop(session_id, None)
+        if old is not None:
+            self._total_bytes -= old[2]
+
+        size = self.size_of(value)
+        self._sessions[session_id] = (value, time.monotonic(), size)
+        self._total_bytes += size
+
+        self._evict_expired(time.monotonic())
+        # Never evict the session being written, even if it alone is over the cap
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes
+        ):
+            oldest_id = next(iter(self._sessions))
+            if oldest_id == session_id:
+                break
+            self._drop(oldest_id)
+
+    def _evict_expired(self, now: float):
+        while self._sessions:
+            oldest_id, (_, last_used, _) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_timeout_seconds:
+                break
+            self._drop(oldest_id)
+
+    def _drop(self, session_id: str):
+        _, _, size = self._sessions.pop(session_id)
+        self._total_bytes -= size
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "estimated_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
@@ -10,3 +10,7 @@ class AgentState(TypedDict):
     analysis: dict | None  # The Pydantic output
     error: str | None
     linter_errors: list[str] | None
+    priority: int  # llm_scheduler.Priority of the request that started this run
+    generated_file: bool  # The source file carries a generator banner
+    triage: dict | None  # Static metrics and tier from triage_node
+    expert_model: str | None  # Overrides EXPERT_MODEL (e.g. the light tier)
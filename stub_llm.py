@@ -0,0 +1,209 @@
+"""
+Deterministic local stand-in for Gemini, selected with LLM_BACKEND=stub.
+
+Answers are derived from a hash of the prompt, so the same request always
+gets the same schema-valid CodeSenseiAnalysis (or chat reply), and no
+network or API key is needed. Latency and failures are simulated:
+
+    LLM_STUB_LATENCY      fixed:MS | uniform:LOW:HIGH | normal:MEAN:STD | lognormal:MEDIAN:SIGMA
+    LLM_STUB_ERROR_RATE   share of calls that fail with a retryable 503 (0-1)
+    LLM_STUB_CHUNK_MS     delay between streamed chunks
+    LLM_STUB_SEED         seed for the latency/failure draws
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections.abc import Callable
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import RunnableLambda
+
+from schemas import BatchAnalysis, CodeIssue, CodeSenseiAnalysis, FunctionAnalysis
+
+STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "lognormal:800:0.4")
+STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+STUB_CHUNK_MS = float(os.getenv("LLM_STUB_CHUNK_MS", "15"))
+STUB_SEED = int(os.getenv("LLM_STUB_SEED", "0"))
+STUB_REPLY_WORDS = 60
+
+FUNCTION_HEADER = re.compile(r"^### FUNCTION: (.+?) ###$", re.MULTILINE)
+
+COMPLEXITIES = ("O(1)", "O(log n)", "O(n)", "O(n log n)", "O(n^2)")
+ISSUE_TYPES = ("Time Complexity", "Redundant Logic", "Naming Convention", "Error Handling")
+SEVERITIES = ("Low", "Medium", "High", "Critical")
+WORDS = (
+    "loop index value result cache list call return branch guard input helper "
+    "refactor extract early exit reuse simplify rename check bound"
+).split()
+
+
+class StubLLMError(RuntimeError):
+    """Injected failure; carries a 503 so llm_scheduler treats it as retryable."""
+
+    code = 503
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Turns a LLM_STUB_LATENCY spec (milliseconds) into a sampler returning seconds."""
+    kind, _, rest = spec.partition(":")
+    try:
+        params = [float(param) for param in rest.split(":")] if rest else []
+    except ValueError:
+        params = []
+
+    if kind == "fixed" and len(params) == 1:
+        sampler = lambda rng: params[0]  # noqa: ARG005, E731
+    elif kind == "uniform" and len(params) == 2:  # noqa: PLR2004
+        sampler = lambda rng: rng.uniform(params[0], params[1])  # noqa: E731
+    elif kind == "normal" and len(params) == 2:  # noqa: PLR2004
+        sampler = lambda rng: rng.gauss(params[0], params[1])  # noqa: E731
+    elif kind == "lognormal" and len(params) == 2:  # noqa: PLR2004
+        # Long right tail, like real LLM latencies; params[0] is the median
+        sampler = lambda rng: params[0] * rng.lognormvariate(0, params[1])  # noqa: E731
+    else:
+        msg = f"Invalid LLM_STUB_LATENCY: {spec!r}"
+        raise ValueError(msg)
+    return lambda rng: max(0.0, sampler(rng)) / 1000
+
+
+_sample_latency = parse_latency(STUB_LATENCY)
+_rng = random.Random(STUB_SEED)
+_rng_lock = threading.Lock()
+
+
+def _draw() -> tuple[float, bool]:
+    """(latency in seconds, whether this call fails) for the next call."""
+    with _rng_lock:
+        return _sample_latency(_rng), _rng.random() < STUB_ERROR_RATE
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf8")).digest()[:8], "big")
+
+
+def stub_analysis(text: str) -> CodeSenseiAnalysis:
+    """The analysis the stub always gives for this prompt text."""
+    digest = _digest(text)
+    issues = [
+        CodeIssue(
+            issue_type=ISSUE_TYPES[(digest >> (8 * i)) % len(ISSUE_TYPES)],
+            severity=SEVERITIES[(digest >> (8 * i + 4)) % len(SEVERITIES)],
+            line_number=1 + (digest >> (8 * i)) % 20,
+            description=f"Stub finding {i + 1} for prompt {digest:016x}.",
+            fix_suggestion="# stub: no real fix suggested",
+        )
+        for i in range(digest % 3)
+    ]
+    return CodeSenseiAnalysis(
+        complexity_estimate=COMPLEXITIES[digest % len(COMPLEXITIES)],
+        plain_english_explanation=f"Stub explanation {digest:016x}: {_words(digest, 25)}.",
+        issues=issues,
+        quality_score=1 + digest % 10,
+    )
+
+
+def stub_batch(text: str) -> BatchAnalysis:
+    """One stub analysis per '### FUNCTION: name ###' header in the prompt."""
+    return BatchAnalysis(
+        analyses=[
+            FunctionAnalysis(function_name=label, analysis=stub_analysis(f"{label}\n{text}"))
+            for label in FUNCTION_HEADER.findall(text)
+        ],
+    )
+
+
+STRUCTURED_BUILDERS = {
+    CodeSenseiAnalysis: stub_analysis,
+    BatchAnalysis: stub_batch,
+}
+
+
+def _words(digest: int, count: int) -> str:
+    rng = random.Random(digest)
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _prompt_text(messages: list[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+def _reply(messages: list[BaseMessage]) -> str:
+    digest = _digest(_prompt_text(messages))
+    return f"Stub reply {digest:016x}: {_words(digest, STUB_REPLY_WORDS)}."
+
+
+def _chunk(index: int, word: str) -> ChatGenerationChunk:
+    return ChatGenerationChunk(message=AIMessageChunk(content=f" {word}" if index else word))
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model with Gemini's surface (invoke/stream/structured output) and no network."""
+
+    model: str = "stub"
+    temperature: float = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "codesensei-stub"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):  # noqa: ARG002
+        _wait()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(_reply(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):  # noqa: ARG002
+        await _await()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(_reply(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):  # noqa: ARG002
+        _wait()
+        for index, word in enumerate(_reply(messages).split(" ")):
+            if index:
+                time.sleep(STUB_CHUNK_MS / 1000)
+            yield _chunk(index, word)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):  # noqa: ARG002
+        await _await()
+        for index, word in enumerate(_reply(messages).split(" ")):
+            if index:
+                await asyncio.sleep(STUB_CHUNK_MS / 1000)
+            yield _chunk(index, word)
+
+    def with_structured_output(self, schema, **kwargs):  # noqa: ARG002
+        builder = STRUCTURED_BUILDERS.get(schema)
+        if builder is None:
+            msg = f"The stub LLM cannot produce {schema!r}."
+            raise ValueError(msg)
+
+        def structured(prompt: PromptValue):
+            _wait()
+            return builder(prompt.to_string())
+
+        async def astructured(prompt: PromptValue):
+            await _await()
+            return builder(prompt.to_string())
+
+        return RunnableLambda(structured, afunc=astructured)
+
+
+def _wait():
+    latency, fails = _draw()
+    time.sleep(latency)
+    if fails:
+        msg = "UNAVAILABLE: injected stub failure"
+        raise StubLLMError(msg)
+
+
+async def _await():
+    latency, fails = _draw()
+    await asyncio.sleep(latency)
+    if fails:
+        msg = "UNAVAILABLE: injected stub failure"
+        raise StubLLMError(msg)
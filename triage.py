@@ -0,0 +1,338 @@
+import os
+import re
+import threading
+from collections import Counter
+
+from linter_engine import LOOP_TYPES
+from parser_engine import STRATEGIES, get_parser, resolve_language_key, split_context
+
+TRIAGE_ENABLED = os.getenv("TRIAGE_ENABLED", "true").lower() == "true"
+
+# Small, shallow functions go to LIGHT_EXPERT_MODEL instead of the full expert
+LIGHT_MAX_STATEMENTS = int(os.getenv("TRIAGE_LIGHT_MAX_STATEMENTS", "6"))
+LIGHT_MAX_COMPLEXITY = int(os.getenv("TRIAGE_LIGHT_MAX_COMPLEXITY", "3"))
+LIGHT_MAX_LOOP_DEPTH = int(os.getenv("TRIAGE_LIGHT_MAX_LOOP_DEPTH", "1"))
+
+# A line with this much code outside string literals marks the code as minified
+MINIFIED_LINE_LENGTH = int(os.getenv("TRIAGE_MINIFIED_LINE_LENGTH", "400"))
+
+# Only looked for in the leading comment, where generators put their banner
+GENERATED_MARKERS = (
+    "@generated",
+    "do not edit",
+    "auto-generated",
+    "autogenerated",
+)
+
+COMMENT_PREFIXES = ("#", "//", "/*", "*", '"""', "'''", "<!--")
+
+STRING_LITERAL = re.compile("|".join(rf"{q}(?:\\.|[^{q}\\\n])*{q}" for q in "\"'`"))
+
+# Containers, not statements (C/C++ bodies are "compound_statement", and a
+# lone C# method parses as a global_statement/local_function_statement)
+CONTAINER_TYPES = {"block", "statement_block", "compound_statement", "global_statement"}
+
+DECLARATION_TYPES = {
+    "declaration",
+    "lexical_declaration",
+    "variable_declaration",
+    "local_variable_declaration",
+}
+
+# Each one adds an independent path through the function
+DECISION_TYPES = {
+    "if_statement",
+    "elif_clause",
+    "conditional_expression",
+    "ternary_expression",
+    "case_clause",
+    "switch_case",
+    "switch_label",
+    "case_statement",
+    "switch_section",
+    "catch_clause",
+    "except_clause",
+    "if_clause",
+    *LOOP_TYPES,
+}
+
+# Short-circuit operators are anonymous tokens in every grammar
+BOOLEAN_OPERATORS = {"&&", "||", "??", "and", "or"}
+
+# Anything that calls out (eval, system, executeQuery, strcpy, ...) needs a real review
+CALL_TYPES = {
+    "call",
+    "call_expression",
+    "method_invocation",
+    "invocation_expression",
+    "new_expression",
+    "object_creation_expression",
+    "explicit_constructor_invocation",
+}
+
+ASSIGNMENT_TYPES = {"assignment", "assignment_expression"}
+
+FIELD_TYPES = {
+    "attribute",
+    "member_expression",
+    "field_expression",
+    "field_access",
+    "member_access_expression",
+}
+
+LITERAL_TYPES = {
+    "string",
+    "string_literal",
+    "raw_string_literal",
+    "character_literal",
+    "char_literal",
+    "integer",
+    "float",
+    "number",
+    "number_literal",
+    "integer_literal",
+    "real_literal",
+    "decimal_integer_literal",
+    "decimal_floating_point_literal",
+    "hex_integer_literal",
+    "true",
+    "false",
+    "none",
+    "null",
+    "null_literal",
+    "nullptr",
+    "boolean_literal",
+}
+
+_counts: Counter = Counter()
+_counts_lock = threading.Lock()
+
+
+def _leading_comment(code: str) -> str:
+    """The comment lines the code opens with, before its first line of code."""
+    comment = []
+    for line in code.splitlines():
+        stripped = line.strip()
+        if stripped and not stripped.startswith(COMMENT_PREFIXES):
+            break
+        comment.append(stripped)
+    return "\n".join(comment)
+
+
+def has_generated_banner(code: str) -> bool:
+    """
+    True when the code opens with a generator banner ("@generated", "DO NOT EDIT").
+
+    Run it on the whole file: an extracted function starts below the banner.
+    """
+    lowered = _leading_comment(code).lower()
+    return any(marker in lowered for marker in GENERATED_MARKERS)
+
+
+def _is_generated(code: str) -> bool:
+    if has_generated_banner(code):
+        return True
+    # One long SQL query or data blob is not minification
+    return any(
+        len(STRING_LITERAL.sub('""', line)) > MINIFIED_LINE_LENGTH for line in code.splitlines()
+    )
+
+
+def _is_plain_value(node) -> bool:
+    """A name, literal or field read off one of those: no calls, indexing or operators."""
+    if node.type in ("identifier", "this") or node.type in LITERAL_TYPES:
+        return True
+    return node.type in FIELD_TYPES and _is_plain_value(node.children[0])
+
+
+def _is_own_field(node) -> bool:
+    """A setter target: a bare name, or a field of self/this."""
+    if node.type == "identifier":
+        return True
+    if node.type not in FIELD_TYPES:
+        return False
+    owner = node.children[0]
+    return owner.type == "this" or owner.text in (b"self", b"this")
+
+
+def _is_accessor_statement(node) -> bool:
+    values = [child for child in node.named_children if "comment" not in child.type]
+    if node.type == "pass_statement":
+        return True
+    if node.type == "return_statement":
+        return all(_is_plain_value(value) for value in values)
+    if node.type == "expression_statement" and len(values) == 1:
+        assignment = values[0]
+        left = assignment.child_by_field_name("left")
+        right = assignment.child_by_field_name("right")
+        return (
+            assignment.type in ASSIGNMENT_TYPES
+            and left is not None
+            and right is not None
+            and _is_own_field(left)
+            and _is_plain_value(right)
+        )
+    return False
+
+
+def _is_pure_accessor(root, function_node_types: list[str]) -> bool:
+    """
+    True for getters and setters: at most one statement, which returns a
+    plain value or stores one in a bare name or own field, and no calls.
+
+    Code whose function node cannot be found (e.g. a method parsed out of
+    its class) is never considered an accessor.
+    """
+    function = None
+    stack = [root]
+    while stack and function is None:
+        node = stack.pop()
+        if node.type in function_node_types:
+            function = node
+        stack.extend(node.children)
+    body = function.child_by_field_name("body") if function else None
+    if body is None:
+        return False
+
+    stack = [body]
+    while stack:
+        node = stack.pop()
+        if node.type in CALL_TYPES or node.type == "ERROR" or node.is_missing:
+            return False
+        stack.extend(node.children)
+
+    if body.type == "arrow_expression_clause":
+        body = body.named_children[0]
+    if body.type not in CONTAINER_TYPES:
+        # Expression-bodied function, e.g. `(o) => o.name`
+        return _is_plain_value(body)
+
+    statements = [child for child in body.named_children if "comment" not in child.type]
+    return len(statements) <= 1 and all(_is_accessor_statement(s) for s in statements)
+
+
+def compute_metrics(
+    code: str,
+    language: str,
+    generated_file: bool = False,  # noqa: FBT001, FBT002
+) -> dict:
+    """
+    Cheap structural metrics for one function from its tree-sitter tree.
+
+    ``generated_file`` carries the file-level banner check; unsupported
+    languages only get the text-based generated/minified check.
+    """
+    # Metrics describe the function itself, not its prepended dependency context
+    _, source = split_context(code)
+    metrics = {
+        "statements": None,
+        "loop_depth": None,
+        "cyclomatic_complexity": None,
+        "pure_accessor": False,
+        "generated": generated_file or _is_generated(source),
+    }
+
+    key = resolve_language_key(language)
+    if not key:
+        return metrics
+
+    containers = CONTAINER_TYPES.union(STRATEGIES[key].function_node_types)
+    statements = max_loop_depth = decisions = 0
+    # (node, number of enclosing loops)
+    root = get_parser().parse(source, key).root_node
+    stack = [(root, 0)]
+    while stack:
+        node, loop_depth = stack.pop()
+
+        if node.is_named:
+            if (
+                node.type.endswith("_statement") and node.type not in containers
+            ) or node.type in DECLARATION_TYPES:
+                statements += 1
+            if node.type in DECISION_TYPES:
+                decisions += 1
+            if node.type in LOOP_TYPES:
+                loop_depth += 1
+                max_loop_depth = max(max_loop_depth, loop_depth)
+        elif node.type in BOOLEAN_OPERATORS:
+            decisions += 1
+
+        stack.extend((child, loop_depth) for child in node.children)
+
+    metrics.update(
+        statements=statements,
+        loop_depth=max_loop_depth,
+        cyclomatic_complexity=decisions + 1,
+        pure_accessor=_is_pure_accessor(root, STRATEGIES[key].function_node_types),
+    )
+    return metrics
+
+
+def classify(metrics: dict, linter_errors: list[str] | None) -> str:
+    """'template' (no LLM call), 'light' (cheaper model) or 'full'."""
+    if metrics["generated"]:
+        return "template"
+    if metrics["statements"] is None:
+        return "full"
+
+    # Only getters/setters: a one-liner like `return eval(a)` or
+    # `strcpy(buf, s)` is short but exactly what a review must catch
+    if not linter_errors and metrics["pure_accessor"]:
+        return "template"
+
+    if (
+        metrics["statements"] <= LIGHT_MAX_STATEMENTS
+        and metrics["cyclomatic_complexity"] <= LIGHT_MAX_COMPLEXITY
+        and metrics["loop_depth"] <= LIGHT_MAX_LOOP_DEPTH
+    ):
+        return "light"
+
+    return "full"
+
+
+def templated_analysis(function_name: str, metrics: dict) -> dict:
+    """A CodeSenseiAnalysis-shaped answer for code not worth an LLM call."""
+    if metrics["generated"]:
+        return {
+            "complexity_estimate": "N/A",
+            "plain_english_explanation": (
+                f"'{function_name}' looks generated or minified, so it was not reviewed "
+                "line by line. Review the source it was generated from instead."
+            ),
+            "issues": [
+                {
+                    "issue_type": "Generated Code",
+                    "severity": "Low",
+                    "line_number": 1,
+                    "description": "Generated or minified code is not meant to be edited by hand.",
+                    "fix_suggestion": "Change the generator input or the unminified source.",
+                },
+            ],
+            "quality_score": 5,
+        }
+
+    return {
+        "complexity_estimate": "O(1)",
+        "plain_english_explanation": (
+            f"'{function_name}' is a plain accessor: it only returns or stores a value, "
+            "with no calls, branches or loops, so there is no logic to untangle here."
+        ),
+        "issues": [],
+        "quality_score": 8,
+    }
+
+
+def record(tier: str):
+    with _counts_lock:
+        _counts[tier] += 1
+
+
+def triage_stats() -> dict:
+    with _counts_lock:
+        return {
+            "enabled": TRIAGE_ENABLED,
+            "templated": _counts["template"],
+            "light": _counts["light"],
+            "full": _counts["full"],
+            "llm_calls_avoided": _counts["template"],
+        }